@@ -32,14 +32,27 @@
 
 def ReadRecord (inFilename, outFilename):
 
+    dt, npts, values = ReadRecordValues(inFilename)
+
+    # Open output file for writing
+    outFileID = open(outFilename, 'w')
+    for value in values:
+        outFileID.write(repr(value) + '\n')
+    outFileID.close()
+
+    return dt, npts
+
+
+# Same parsing as ReadRecord, but the ground motion values are returned
+# as a list of floats instead of being echoed to a .g3 file
+def ReadRecordValues (inFilename):
+
     dt = 0.0
     npts = 0
+    values = []
     
     # Open the input file and catch the error if it can't be read
     inFileID = open(inFilename, 'r')
-    
-    # Open output file for writing
-    outFileID = open(outFilename, 'w')
 	
     # Flag indicating dt is found and that ground motion
     # values should be read -- ASSUMES dt is on last line
@@ -52,8 +65,8 @@ def ReadRecord (inFilename, outFilename):
             # Blank line --> do nothing
             continue
         elif flag == 1:
-            # Echo ground motion values to output file
-            outFileID.write(line)
+            # Collect ground motion values
+            values.extend(float(word) for word in line.split())
         else:
             # Search header lines for dt
             words = line.split()
@@ -100,6 +113,5 @@ def ReadRecord (inFilename, outFilename):
                         
 
     inFileID.close()
-    outFileID.close()
 
-    return dt, npts
+    return dt, npts, values
@@ -0,0 +1,100 @@
+############################################################################
+#               Limit state check benchmark
+
+# Created by:   Huy Pham
+#               University of California, Berkeley
+
+# Date created: October 2026
+
+# Description:  Times the drift limit state checks of failurePostprocess on
+#               a synthetic 12,000-step history (60 s at dt = 0.005):
+#               element-wise any() generators, as before, against the
+#               single drift matrix pass of postprocessing.limitStateChecks
+#               Also checks both give the same flags, and the peak and
+#               first-exceedance steps against a plain loop over the history
+
+# Open issues:  (1)
+
+############################################################################
+
+import timeit
+import numpy as np
+import pandas as pd
+
+from postprocessing import limitStateChecks
+
+nSteps      = 12000
+limits      = [0.05, 0.025, 0.007]
+nRepeat     = 5
+
+# drift-like histories: 3 stories x outer/inner column lines
+# large: crosses the limits early (generators can stop early)
+# small: stays below every limit (generators scan the whole history)
+rng         = np.random.default_rng(985)
+time        = np.arange(nSteps)*0.005
+envelope    = np.sin(np.pi*time/time[-1])
+
+def driftHistories(amplitude):
+    return({(story, line): pd.Series(amplitude*envelope*
+                                     np.sin(2*np.pi*time/(1.5 + 0.2*story)) +
+                                     0.05*amplitude*rng.standard_normal(nSteps))
+            for story in range(3) for line in range(2)})
+
+# previous implementation: one generator per story, column line and limit
+def generatorChecks(storyDrift):
+    flags = np.zeros((3, len(limits)), dtype=bool)
+    for k, limit in enumerate(limits):
+        for story in range(3):
+            if(any(abs(driftRatio) > limit
+                   for driftRatio in storyDrift[(story, 0)]) or
+               any(abs(driftRatio) > limit
+                   for driftRatio in storyDrift[(story, 1)])):
+                flags[story, k] = True
+    return(flags)
+
+def driftMatrixOf(storyDrift):
+    return(np.array([[storyDrift[(story, line)] for line in range(2)]
+                     for story in range(3)]).transpose(2, 0, 1))
+
+def matrixChecks(storyDrift):
+    flags, peak, peakStep, firstStep, driftEnvelope = limitStateChecks(
+        driftMatrixOf(storyDrift), limits)
+    return(flags)
+
+# reference peak and first-exceedance steps (-1: never), step by step
+def loopSteps(storyDrift):
+    peakStep    = np.zeros(3, dtype=int)
+    firstStep   = np.full((3, len(limits)), -1)
+    for story in range(3):
+        worst   = [max(abs(storyDrift[(story, 0)][step]),
+                       abs(storyDrift[(story, 1)][step]))
+                   for step in range(nSteps)]
+        peakStep[story] = worst.index(max(worst))
+        for k, limit in enumerate(limits):
+            for step, drift in enumerate(worst):
+                if drift > limit:
+                    firstStep[story, k] = step
+                    break
+    return(peakStep, firstStep)
+
+if __name__ == '__main__':
+    print('Steps:', nSteps)
+    for case, amplitude in [('large', 0.03), ('small', 0.004)]:
+        storyDrift  = driftHistories(amplitude)
+        assert (generatorChecks(storyDrift) == matrixChecks(storyDrift)).all()
+
+        flags, peak, peakStep, firstStep, driftEnvelope = limitStateChecks(
+            driftMatrixOf(storyDrift), limits)
+        refPeakStep, refFirstStep = loopSteps(storyDrift)
+        assert (peakStep == refPeakStep).all()
+        assert (firstStep == refFirstStep).all()
+        print(case + ' drifts: peak step per story', peakStep.tolist(),
+              ', first step over', limits, firstStep.tolist())
+
+        tGenerator  = min(timeit.repeat(lambda: generatorChecks(storyDrift),
+                                        number=1, repeat=nRepeat))
+        tMatrix     = min(timeit.repeat(lambda: matrixChecks(storyDrift),
+                                        number=1, repeat=nRepeat))
+
+        print(case + ' drifts: generator %.2f ms, drift matrix %.2f ms, %.0fx'
+              % (1000*tGenerator, 1000*tMatrix, tGenerator/tMatrix))
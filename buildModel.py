@@ -7,7 +7,7 @@
 # Date created: April 2022
 
 # Description:  Script models designed structure (superStructDesign.py) in OpenSeesPy.
-#               Returns loading if function called
+#               Returns loading if function called (also kept on the run context)
 #               Adapted for DoE
 
 # Open issues:  (1) 
@@ -47,10 +47,6 @@ def refix(nodeTag, action):
     if(action == "unfix"):
         ops.fix(nodeTag,  0, 1, 0, 1, 0, 1)
 
-# returns load to analysis script
-def giveLoads():
-    return(w0, w1, w2, w3, pLc0, pLc1, pLc2, pLc3)
-
 # add superstructure damping (dependent on eigenvalue anly)
 def provideSuperDamping(regTag, w2, zetai=0.05, zetaj=0.05, modes=[1,3]):
     # Pick your modes and damping ratios
@@ -139,7 +135,7 @@ def getModifiedIK(shape, L):
 #              Start model
 ############################################################################
 
-def build():
+def build(ctx=None):
 
     # remove existing model
     ops.wipe()
@@ -163,8 +159,11 @@ def build():
     # command: model('basic', '-ndm', ndm, '-ndf', ndf=ndm*(ndm+1)/2)
     ops.model('basic', '-ndm', 3, '-ndf', 6)
 
-    import superStructDesign as sd
-    (mu1, mu2, mu3, R1, R2, R3, moatGap, selectedBeam, selectedRoofBeam, selectedCol) = sd.design()
+    # design is carried by the run context (read from input file if standalone)
+    if ctx is None:
+        from runContext import RunContext
+        ctx = RunContext.fromCsv()
+    (mu1, mu2, mu3, R1, R2, R3, moatGap, selectedBeam, selectedRoofBeam, selectedCol) = ctx.getDesign()
 
     (AgCol, IzCol, IyCol, ZxCol, SxCol, dCol, bfCol, tfCol, twCol) = getProperties(selectedCol)
     (AgBeam, IzBeam, IyBeam, ZxBeam, SxBeam, dBeam, bfBeam, tfBeam, twBeam) = getProperties(selectedBeam)
@@ -177,8 +176,6 @@ def build():
     # assuming mass only includes a) dead load, no weight, no live load, unfactored, or b) dead load + live load, factored
     # masses represent half the building's mass
 
-    global w0, w1, w2, w3, pLc0, pLc1, pLc2, pLc3
-
     m0Inner = 81.7*kip/g
     m1Inner = 81.7*kip/g
     m2Inner = 81.7*kip/g
@@ -806,6 +803,10 @@ def build():
     ops.element('zeroLength', 884, 14, 84, '-mat', impactMatTag, elasticMatTag,
             '-dir', 1, 3, '-orient', 1, 0, 0, 0, 1, 0)
 
+    # return loading to the analysis script through the run context
+    ctx.loads = (w0, w1, w2, w3, pLc0, pLc1, pLc2, pLc3)
+    return(ctx.loads)
+
 # if ran alone, build model and plot
 if __name__ == '__main__':
     build()
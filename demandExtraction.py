@@ -0,0 +1,126 @@
+############################################################################
+#               Demand extraction
+
+# Created by:   Huy Pham
+#               University of California, Berkeley
+
+# Date created: October 2026
+
+# Description:  Geometry-driven demands for an isolated frame of any story
+#               and bay count
+#               FrameGeometry follows the buildModel numbering: floor f
+#               (0 = isolation level) has column line nodes 10*(f+1) + j,
+#               j = 1..nBay+1, and the leaning column after them; it also
+#               gives the element tags the recorders and monitors poll
+#               Recorder histories are read into (step, floor, column line)
+#               arrays; peak values go straight to pelicun EDP tables
+
+# Open issues:  (1) uniform story height
+#               (2) one horizontal direction is analyzed; other pelicun
+#                   directions repeat it
+
+############################################################################
+
+import numpy as np
+import pandas as pd
+
+class FrameGeometry:
+
+    def __init__(self, nStory=3, nBay=3, storyHeight=13*12.0):
+        self.nStory         = nStory
+        self.nBay           = nBay
+        self.nFloor         = nStory + 1          # isolation level + stories
+        self.nLine          = nBay + 1            # moment frame column lines
+        self.storyHeight    = storyHeight
+
+    # nodes recorded at a floor: column lines, then the leaning column
+    def floorNodes(self, floor):
+        return([10*(floor+1) + j for j in range(1, self.nLine+2)])
+
+    # isolators under the column lines (50 + j), then the leaning column
+    def isolatorElements(self):
+        return([50 + j for j in range(1, self.nLine+2)])
+
+    # moment frame columns of a story (1 = above the isolation level)
+    def columnElements(self, story):
+        return([100 + 10*story + j for j in range(1, self.nLine+1)])
+
+    # isolation level diaphragm beams, one per bay
+    def diaphragmElements(self):
+        return([610 + bay for bay in range(1, self.nBay+1)])
+
+    # moat wall impact springs at the outer isolation nodes
+    def impactElements(self):
+        return({'Left': 881, 'Right': 880 + self.nLine})
+
+    # recorder file names (without .csv) and their column names
+    def channel(self, floor, response):
+        if (floor == 0) and (response == 'Disp'):
+            return('isolDisp')
+        return('story' + str(floor) + response)
+
+    def channelColumns(self):
+        return(['time'] + ['isol'+str(j) for j in range(1, self.nLine+1)] +
+               ['isolLC'])
+
+# response histories as arrays over every floor and column line
+# readChannel(channel, names) -> DataFrame (runArchive.csvReader or
+# RunArchive.reader)
+# disp, vel: (nSteps, nFloor, nLine) in in, in/s (relative)
+# acc: (nSteps, nFloor, nLine) in g (absolute, as recorded)
+# drift: (nSteps, nStory, nLine) interstory drift ratio
+def demandHistories(readChannel, geometry=None, g=386.4):
+    if geometry is None:
+        geometry = FrameGeometry()
+
+    names       = geometry.channelColumns()
+    lineNames   = names[1:geometry.nLine+1]
+
+    histories   = dict()
+    for response in ['Disp', 'Acc', 'Vel']:
+        floors  = [readChannel(geometry.channel(floor, response), names)
+                   for floor in range(geometry.nFloor)]
+        histories[response] = np.stack([floor[lineNames].to_numpy()
+                                        for floor in floors], axis=1)
+    histories['time']   = floors[0]['time'].to_numpy()
+
+    disp                = histories.pop('Disp')
+    histories['disp']   = disp
+    histories['acc']    = histories.pop('Acc')/g
+    histories['vel']    = histories.pop('Vel')
+    histories['drift']  = (disp[:,1:,:] - disp[:,:-1,:])/geometry.storyHeight
+    return(histories)
+
+# pelicun demand table from peak values
+# pfa, pfv: (nRuns, nFloor), pid: (nRuns, nStory); floors numbered from 1
+# type-floor-direction columns, units row first, as get_EDP
+def edpTable(pfa, pfv, pid, index=None, directions=(1, 2),
+             units=('g', 'inps', 'rad')):
+    pfa, pfv, pid   = np.atleast_2d(pfa), np.atleast_2d(pfv), np.atleast_2d(pid)
+
+    columns     = []
+    unitRow     = []
+    blocks      = []
+    for direction in directions:
+        for edpType, values, unit in zip(['PFA', 'PFV', 'PID'],
+                                         [pfa, pfv, pid], units):
+            columns     += [edpType+'-'+str(i+1)+'-'+str(direction)
+                            for i in range(values.shape[1])]
+            unitRow     += [unit]*values.shape[1]
+            blocks.append(values)
+
+    EDP_data    = pd.DataFrame(np.hstack(blocks), index=index, columns=columns)
+    unitsDf     = pd.DataFrame([unitRow], index=['Units'], columns=columns)
+    return(pd.concat([unitsDf, EDP_data.astype(object)]))
+
+# pelicun demand table from results rows (accMax0.., velMax0.., driftMax1..)
+def pelicunEDP(results, nStory=None, directions=(1, 2)):
+    if nStory is None:
+        nStory  = sum(1 for col in results.columns
+                      if col.startswith('driftMax'))
+
+    pfa = results[['accMax'+str(i) for i in range(nStory+1)]].to_numpy()
+    pfv = results[['velMax'+str(i) for i in range(nStory+1)]].to_numpy()
+    pid = results[['driftMax'+str(i+1) for i in range(nStory)]].to_numpy()
+    return(edpTable(pfa, pfv, pid, index=results.index,
+                    directions=directions))
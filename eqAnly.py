@@ -8,13 +8,24 @@
 
 # Description:  Script performs dynamic analysis on OpenSeesPy model
 
+#               Steps that fail to converge are retried with fallback
+#               algorithms, then sub-stepped, within the same analysis
+#               Analysis stops early on collapse drift or once the free
+#               vibration after the record has died out (ctx.stopReason)
+#               A collapse stop returns collapseStatus, so the run is
+#               postprocessed as a failed run (state at 0.20 drift)
+#               recordMode 'envelope' keeps response envelopes in memory
+#               (ctx.envelope) instead of writing csv histories
+#               Eigenvalues are kept per design (modalCache): later GMs and
+#               retries on the same design rebuild the model and rerun
+#               gravity, but skip refix and eigen
+
 # Open issues:  (1) 
 
 ############################################################################
 
 
 # import OpenSees and libraries
-from math import floor
 import openseespy.opensees as ops
 
 ############################################################################
@@ -22,13 +33,70 @@ import openseespy.opensees as ops
 ############################################################################
 
 import buildModel as bm
+from superStructDesign import getDesignKey
+from responseMonitor import StopMonitor, EnvelopeRecorder
+from demandExtraction import FrameGeometry
 
-def runGM(gmFilename, gmDefScale, dtTransient):
+############################################################################
+#              Step control
+############################################################################
 
-    # build model
-    bm.build()
+# one step with the fallback algorithms, back to the default afterwards
+def tryAlgorithms(dtStep, algorithmType):
+    ok = ops.analyze(1, dtStep)
+    if ok != 0:
+        print("Trying Newton with Initial Tangent...")
+        ops.algorithm('Newton', '-initial')
+        ok = ops.analyze(1, dtStep)
+        if ok == 0:
+            print("That worked. Back to Newton")
+        ops.algorithm(algorithmType)
+    if ok != 0:
+        print("Trying Newton with line search ...")
+        ops.algorithm('NewtonLineSearch')
+        ok = ops.analyze(1, dtStep)
+        if ok == 0:
+            print("That worked. Back to Newton")
+        ops.algorithm(algorithmType)
+    return(ok)
+
+# advance one nominal step; if it fails, cover the same interval with
+# progressively smaller sub-steps (dtStep/subDivisions[k]), keeping the
+# sub-steps that already converged
+def adaptiveStep(dtStep, algorithmType, subDivisions=(5, 10)):
+    tTarget     = ops.getTime() + dtStep
+    ok          = tryAlgorithms(dtStep, algorithmType)
+
+    for nSub in subDivisions:
+        if ok == 0:
+            break
+        dtSub       = dtStep/nSub
+        print("Sub-stepping at dt =", dtSub)
+        ok          = 0
+        while (ok == 0) and (tTarget - ops.getTime() > 1e-6*dtSub):
+            ok      = tryAlgorithms(min(dtSub, tTarget - ops.getTime()),
+                                    algorithmType)
+    return(ok)
+
+# run status of an analysis stopped on collapse drift (ops.analyze failures
+# are negative too, -3 for nonconvergence)
+collapseStatus  = -4
+
+# eigenvalues of each design (getDesignKey), from its first eigen analysis
+# in this process
+# ARPACK's start vector carries over between eigen calls, so a later call
+# on the same model differs in the last digits; reusing the first call's
+# values gives every GM on a design the result of a fresh process
+modalCache      = dict()
+
+# build, gravity, eigen and damping: everything before the dynamic phase
+# OpenSees database save/restore is not usable with the TFP elements, so
+# the post-gravity state is reproduced by rebuilding from the design
+# reuseModal: take the eigenvalues from modalCache when the design is there
+def prepareModel(ctx, reuseModal=True):
 
-    (w0, w1, w2, w3, pLc0, pLc1, pLc2, pLc3) = bm.giveLoads()
+    # build model
+    (w0, w1, w2, w3, pLc0, pLc1, pLc2, pLc3) = bm.build(ctx)
 
     ############################################################################
     #              Clear previous runs
@@ -37,15 +105,10 @@ def runGM(gmFilename, gmDefScale, dtTransient):
     gravSeriesTag   = 1
     gravPatternTag  = 1
 
-    eqSeriesTag     = 100
-    eqPatternTag    = 400
-
     ############################################################################
     #              Loading and analysis
     ############################################################################
 
-    from ReadRecord import ReadRecord
-
     # ------------------------------
     # Loading: gravity
     # ------------------------------
@@ -105,26 +168,36 @@ def runGM(gmFilename, gmDefScale, dtTransient):
     #                       Eigenvalue Analysis
     ############################################################################
 
-    # fix base for Tfb
-    bm.refix(11, "fix")
-    bm.refix(12, "fix")
-    bm.refix(13, "fix")
-    bm.refix(14, "fix")
-    # bm.refix(15, "fix")
+    designKey   = getDesignKey(ctx.param)
+
+    if reuseModal and (designKey in modalCache):
+        lambdaN     = modalCache[designKey]
+    else:
+        # fix base for Tfb
+        bm.refix(11, "fix")
+        bm.refix(12, "fix")
+        bm.refix(13, "fix")
+        bm.refix(14, "fix")
+        # bm.refix(15, "fix")
+
+        nEigenJ     = 3;                    # mode j = 3
+        lambdaN     = ops.eigen(nEigenJ);       # eigenvalue analysis for nEigenJ modes
+
+        # unfix base
+        bm.refix(11, "unfix")
+        bm.refix(12, "unfix")
+        bm.refix(13, "unfix")
+        bm.refix(14, "unfix")
+        # bm.refix(15, "unfix")
+
+        modalCache.setdefault(designKey, lambdaN)
 
-    nEigenJ     = 3;                    # mode j = 3
-    lambdaN     = ops.eigen(nEigenJ);       # eigenvalue analysis for nEigenJ modes
     lambda1     = lambdaN[0];           # eigenvalue mode i = 1
     omega1      = lambda1**(0.5)    # w1 (1st mode circular frequency)
     Tfb         = 2*3.1415/omega1      # 1st mode period of the structure
-    print("Tfb = ", Tfb, " s")          # display the first mode period in the command window
 
-    # unfix base
-    bm.refix(11, "unfix")
-    bm.refix(12, "unfix")
-    bm.refix(13, "unfix")
-    bm.refix(14, "unfix")
-    # bm.refix(15, "unfix")
+    print("Tfb = ", Tfb, " s")          # display the first mode period in the command window
+    ctx.Tfb     = Tfb
 
     # Rayleigh damping to the superstructure only
     regTag      = 80
@@ -132,47 +205,44 @@ def runGM(gmFilename, gmDefScale, dtTransient):
     # bm.provideSuperDamping(regTag, omega1, zetaTarget)
     bm.provideSuperDamping(regTag, lambdaN, zetai=0.05, zetaj=0.02, modes=[1,3])
 
-    ############################################################################
-    #              Recorders
-    ############################################################################
+    return(Tfb)
 
-    dataDir         = './outputs/'          # output folder
-    #file mkdir $dataDir; # create output folder
+############################################################################
+#              Recorders
+############################################################################
+
+# text recorders for every response, '-closeOnWrite' csv in dataDir
+# accelerations are absolute (requires the ground motion series)
+# nodes and elements from geometry (demandExtraction.FrameGeometry)
+def csvRecorders(dataDir, eqSeriesTag, geometry=None):
+    if geometry is None:
+        geometry    = FrameGeometry()
+    floors          = range(geometry.nFloor)
 
     ops.printModel('-file', dataDir+'model.out')
     ops.recorder('Node', '-file', dataDir+'isolDisp.csv', '-time',
-        '-closeOnWrite', '-node', 11, 12, 13, 14, 15, '-dof', 1, 'disp')
+        '-closeOnWrite', '-node', *geometry.floorNodes(0), '-dof', 1, 'disp')
     ops.recorder('Node', '-file', dataDir+'isolVert.csv', '-time',
-        '-closeOnWrite', '-node', 11, 12, 13, 14, 15, '-dof', 3, 'disp')
+        '-closeOnWrite', '-node', *geometry.floorNodes(0), '-dof', 3, 'disp')
     ops.recorder('Node', '-file', dataDir+'isolRot.csv', '-time',
-        '-closeOnWrite', '-node', 11, 12, 13, 14, 15, '-dof', 5, 'disp')
-
-    ops.recorder('Node', '-file', dataDir+'story1Disp.csv','-time',
-        '-closeOnWrite', '-node', 21, 22, 23, 24, 25, '-dof', 1, 'disp')
-    ops.recorder('Node', '-file', dataDir+'story2Disp.csv', '-time',
-        '-closeOnWrite', '-node', 31, 32, 33, 34, 35, '-dof', 1, 'disp')
-    ops.recorder('Node', '-file', dataDir+'story3Disp.csv', '-time',
-        '-closeOnWrite', '-node', 41, 42, 43, 44, 45, '-dof', 1, 'disp')
-
-    ops.recorder('Element', '-file', dataDir+'isol1Force.csv',
-        '-time', '-closeOnWrite', '-ele', 51, 'localForce')
-    ops.recorder('Element', '-file', dataDir+'isol2Force.csv',
-        '-time', '-closeOnWrite', '-ele', 52, 'localForce')
-    ops.recorder('Element', '-file', dataDir+'isol3Force.csv',
-        '-time', '-closeOnWrite', '-ele', 53, 'localForce')
-    ops.recorder('Element', '-file', dataDir+'isol4Force.csv',
-        '-time', '-closeOnWrite', '-ele', 54, 'localForce')
+        '-closeOnWrite', '-node', *geometry.floorNodes(0), '-dof', 5, 'disp')
+
+    for floor in floors[1:]:
+        ops.recorder('Node', '-file', dataDir+geometry.channel(floor, 'Disp')+'.csv',
+            '-time', '-closeOnWrite', '-node', *geometry.floorNodes(floor),
+            '-dof', 1, 'disp')
+
+    # column line isolators, then the leaning column
+    isolEles        = geometry.isolatorElements()
+    for j, ele in enumerate(isolEles[:-1]):
+        ops.recorder('Element', '-file', dataDir+'isol'+str(j+1)+'Force.csv',
+            '-time', '-closeOnWrite', '-ele', ele, 'localForce')
     ops.recorder('Element', '-file', dataDir+'isolLCForce.csv',
-        '-time', '-closeOnWrite', '-ele', 55, 'localForce')
+        '-time', '-closeOnWrite', '-ele', isolEles[-1], 'localForce')
 
-    ops.recorder('Element', '-file', dataDir+'colForce1.csv',
-        '-time', '-closeOnWrite', '-ele', 111, 'localForce')
-    ops.recorder('Element', '-file', dataDir+'colForce2.csv',
-        '-time', '-closeOnWrite', '-ele', 112, 'localForce')
-    ops.recorder('Element', '-file', dataDir+'colForce3.csv',
-        '-time', '-closeOnWrite', '-ele', 113, 'localForce')
-    ops.recorder('Element', '-file', dataDir+'colForce4.csv',
-        '-time', '-closeOnWrite', '-ele', 114, 'localForce')
+    for j, ele in enumerate(geometry.columnElements(1)):
+        ops.recorder('Element', '-file', dataDir+'colForce'+str(j+1)+'.csv',
+            '-time', '-closeOnWrite', '-ele', ele, 'localForce')
 
     # ops.recorder('Element', '-file', dataDir+'colForce5.csv', '-time', '-closeOnWrite', '-ele', 121, 'localForce')
     # ops.recorder('Element', '-file', dataDir+'colForce6.csv', '-time', '-closeOnWrite', '-ele', 122, 'localForce')
@@ -187,15 +257,46 @@ def runGM(gmFilename, gmDefScale, dtTransient):
     # ops.recorder('Element', '-file', dataDir+'beamForce5.csv', '-time', '-closeOnWrite', '-ele', 232, 'localForce')
     # ops.recorder('Element', '-file', dataDir+'beamForce6.csv', '-time', '-closeOnWrite', '-ele', 233, 'localForce')
 
-    ops.recorder('Element', '-file', dataDir+'diaphragmForce1.csv', '-time', '-closeOnWrite', '-ele', 611, 'localForce')
-    ops.recorder('Element', '-file', dataDir+'diaphragmForce2.csv', '-time', '-closeOnWrite', '-ele', 612, 'localForce')
-    ops.recorder('Element', '-file', dataDir+'diaphragmForce3.csv', '-time', '-closeOnWrite', '-ele', 613, 'localForce')
+    for bay, ele in enumerate(geometry.diaphragmElements()):
+        ops.recorder('Element', '-file', dataDir+'diaphragmForce'+str(bay+1)+'.csv',
+            '-time', '-closeOnWrite', '-ele', ele, 'localForce')
+
+    impactEles      = geometry.impactElements()
+    for side in ['Left', 'Right']:
+        ops.recorder('Element', '-file', dataDir+'impactForce'+side+'.csv',
+            '-time', '-closeOnWrite', '-ele', impactEles[side], 'basicForce')
+    for side in ['Left', 'Right']:
+        ops.recorder('Element', '-file', dataDir+'impactDisp'+side+'.csv',
+            '-time', '-closeOnWrite', '-ele', impactEles[side], 'basicDeformation')
+
+    # set recorder for absolute acceleration (requires time series defined)
+    for floor in floors:
+        ops.recorder('Node', '-file', dataDir+geometry.channel(floor, 'Acc')+'.csv',
+            '-timeSeries', eqSeriesTag, '-time', '-closeOnWrite',
+            '-node', *geometry.floorNodes(floor), '-dof', 1, 'accel')
+
+    for floor in floors:
+        ops.recorder('Node', '-file', dataDir+geometry.channel(floor, 'Vel')+'.csv',
+            '-time', '-closeOnWrite', '-node', *geometry.floorNodes(floor),
+            '-dof', 1, 'vel')
+
+def runGM(gmFilename, gmDefScale, dtTransient, ctx=None, subDivisions=(5, 10),
+          collapseDrift=0.20, tailTol=0.01, tailWindow=2.0, recordMode='csv',
+          reuseModal=True):
 
-    ops.recorder('Element', '-file', dataDir+'impactForceLeft.csv', '-time', '-closeOnWrite', '-ele', 881, 'basicForce')
-    ops.recorder('Element', '-file', dataDir+'impactForceRight.csv', '-time', '-closeOnWrite', '-ele', 884, 'basicForce')
+    # run context carries params, design and output location
+    # standalone: read ./inputs/bearingInput.csv, record to ./outputs/
+    if ctx is None:
+        from runContext import RunContext
+        ctx = RunContext.fromCsv()
 
-    ops.recorder('Element', '-file', dataDir+'impactDispLeft.csv', '-time', '-closeOnWrite', '-ele', 881, 'basicDeformation')
-    ops.recorder('Element', '-file', dataDir+'impactDispRight.csv', '-time', '-closeOnWrite', '-ele', 884, 'basicDeformation')
+    # model ready for the dynamic phase
+    Tfb             = prepareModel(ctx, reuseModal)
+
+    eqSeriesTag     = 100
+    eqPatternTag    = 400
+
+    from recordStore import getStore
 
     ############################################################################
     #                       Dynamic analysis
@@ -205,7 +306,7 @@ def runGM(gmFilename, gmDefScale, dtTransient):
 
     # Uniform Earthquake ground motion (uniform acceleration input at all support nodes)
 
-    GMDir           = "./groundMotions/PEERNGARecords_Unscaled/"
+    GMDir           = ctx.gmDir
     GMDirection     = 1                             # ground-motion direction
     GMFile          = gmFilename                    # ground motion file name passed in
     GMFactor        = gmDefScale
@@ -234,71 +335,59 @@ def runGM(gmFilename, gmDefScale, dtTransient):
     # the following commands are unique to the Uniform Earthquake excitation
 
     # Uniform EXCITATION: acceleration input
-    inFile          = GMDir + GMFile + '.AT2'
-    outFile         = GMDir + GMFile + '.g3'        # set variable holding new filename (PEER files have .at2/dt2 extension)
-
-    dt, nPts        = ReadRecord(inFile, outFile)   # call procedure to convert the ground-motion file
+    # record parsed once per process (cached as .npy), no .g3 rewrite
+    dt, nPts, gmAccel = getStore(GMDir).getRecord(GMFile)
     g               = 386.4
     GMfatt          = g*GMFactor                    # data in input file is in g Unifts -- ACCELERATION TH
 
-    ops.timeSeries('Path', eqSeriesTag, '-dt', dt, '-filePath', outFile, '-factor', GMfatt)     # time series information
+    ops.timeSeries('Path', eqSeriesTag, '-dt', dt, '-values', *gmAccel.tolist(), '-factor', GMfatt)     # time series information
     ops.pattern('UniformExcitation', eqPatternTag, GMDirection, '-accel', eqSeriesTag)          # create uniform excitation
 
-    # set recorder for absolute acceleration (requires time series defined)
-    ops.recorder('Node', '-file', dataDir+'story0Acc.csv',
-        '-timeSeries', eqSeriesTag, '-time', '-closeOnWrite',
-        '-node', 11, 12, 13, 14, 15, '-dof', 1, 'accel')
-    ops.recorder('Node', '-file', dataDir+'story1Acc.csv',
-        '-timeSeries', eqSeriesTag, '-time', '-closeOnWrite',
-        '-node', 21, 22, 23, 24, 25, '-dof', 1, 'accel')
-    ops.recorder('Node', '-file', dataDir+'story2Acc.csv',
-        '-timeSeries', eqSeriesTag, '-time', '-closeOnWrite',
-        '-node', 31, 32, 33, 34, 35, '-dof', 1, 'accel')
-    ops.recorder('Node', '-file', dataDir+'story3Acc.csv',
-        '-timeSeries', eqSeriesTag, '-time', '-closeOnWrite',
-        '-node', 41, 42, 43, 44, 45, '-dof', 1, 'accel')
-
-    ops.recorder('Node', '-file', dataDir+'story0Vel.csv',
-        '-time', '-closeOnWrite', '-node', 11, 12, 13, 14, 15, '-dof', 1, 'vel')
-    ops.recorder('Node', '-file', dataDir+'story1Vel.csv',
-        '-time', '-closeOnWrite', '-node', 21, 22, 23, 24, 25, '-dof', 1, 'vel')
-    ops.recorder('Node', '-file', dataDir+'story2Vel.csv',
-        '-time', '-closeOnWrite', '-node', 31, 32, 33, 34, 35, '-dof', 1, 'vel')
-    ops.recorder('Node', '-file', dataDir+'story3Vel.csv',
-        '-time', '-closeOnWrite', '-node', 41, 42, 43, 44, 45, '-dof', 1, 'vel')
+    # full histories to csv (standalone, plotter.py), or envelopes in memory
+    if recordMode == 'csv':
+        csvRecorders(ctx.makeOutputDir(), eqSeriesTag, ctx.geometry)
+        envelope    = None
+    else:
+        envelope    = EnvelopeRecorder(gmAccel, dt, GMfatt, ctx.geometry)
 
     # set up ground-motion-analysis parameters
     sec             = 1.0                      
     TmaxAnalysis    = 60.0*sec
 
-    Nsteps          = floor(TmaxAnalysis/dtTransient)
-    ok              = ops.analyze(Nsteps, dtTransient)   # actually perform analysis; returns ok=0 if analysis was successful
-
-    if ok != 0:
-        ok              = 0
-        controlTime     = ops.getTime()
-        print("Convergence issues at time: ", controlTime)
-        while (controlTime < TmaxAnalysis) and (ok == 0):
-            controlTime     = ops.getTime()
-            ok          = ops.analyze(1, dtTransient)
-            if ok != 0:
-                print("Trying Newton with Initial Tangent...")
-                ops.algorithm('Newton', '-initial')
-                ok = ops.analyze(1, dtTransient)
-                if ok == 0:
-                    print("That worked. Back to Newton")
-                ops.algorithm(algorithmTypeDynamic)
-            if ok != 0:
-                print("Trying Newton with line search ...")
-                ops.algorithm('NewtonLineSearch')
-                ok = ops.analyze(1, dtTransient)
-                if ok == 0:
-                    print("That worked. Back to Newton")
-                ops.algorithm(algorithmTypeDynamic)
-
+    # step-wise so the monitor can stop on collapse or a decayed tail
+    monitor         = StopMonitor(dt*nPts, collapseDrift, tailTol, tailWindow,
+                                  ctx.geometry)
+    ctx.stopReason  = 'end'
+    ok              = 0
+
+    while (ops.getTime() < TmaxAnalysis - 0.5*dtTransient):
+        ok          = adaptiveStep(dtTransient, algorithmTypeDynamic,
+                                   subDivisions)   # returns ok=0 if step was successful
+        if ok != 0:
+            print("Convergence issues at time: ", ops.getTime())
+            ctx.stopReason  = 'nonconvergence'
+            break
+
+        if envelope is not None:
+            envelope.record()
+
+        stopReason  = monitor.check()
+        if stopReason is not None:
+            print("Stopping early (" + stopReason + ") at time: ", ops.getTime())
+            ctx.stopReason  = stopReason
+            if stopReason == 'collapse':
+                ok  = collapseStatus
+            break
 
     print('Ground motion done. End time:', ops.getTime())
 
+    if envelope is not None:
+        ctx.envelope    = envelope.summary()
+
     ops.wipe()
 
+    # keep the csv histories as a compressed archive entry
+    if (envelope is None) and (ctx.archive is not None):
+        ctx.archive.save(ctx.runId, ctx.outputDir)
+
     return(ok, Tfb, GMFactor)
\ No newline at end of file
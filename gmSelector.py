@@ -7,6 +7,8 @@
 # Date created: September 2020
 
 # Description:  Script creates list of viable ground motions and scales from PEER search
+#               PEER search csv is loaded once into a GMDatabase and queried in memory
+#               H1 spectra can be recomputed from the records (responseSpectrum.py)
 
 # Open issues:  (1) Lengths of sections require specifications
 #               (2) Manually specify how many of each EQ you want
@@ -14,6 +16,7 @@
 ############################################################################
 import pandas as pd
 import os
+import re
 import numpy as np
 
 pd.options.mode.chained_assignment = None  # default='warn', ignore SettingWithCopyWarning
@@ -26,6 +29,139 @@ pd.options.mode.chained_assignment = None  # default='warn', ignore SettingWithC
 
 ############################################################################
 
+############################################################################
+#               Ground motion database
+
+# The PEER search csv is parsed once per section layout and kept in memory
+# Summary metadata stays a DataFrame; Horizontal-1 spectra are NumPy arrays
+# (period x record) indexed by RSN
+
+############################################################################
+
+class GMDatabase:
+
+    def __init__(self, gmDir, resultsCSV, summaryStart=33, nSummary=100,
+                 unscaledStart=258, nUnscaled=111):
+        self.gmDir = gmDir
+        self.resultsCSV = resultsCSV
+
+        # load in sections of the sheet
+        self.summary = pd.read_csv(gmDir+resultsCSV,
+            skiprows=summaryStart, nrows=nSummary)
+        self.unscaledSpectra = pd.read_csv(gmDir+resultsCSV,
+            skiprows=unscaledStart, nrows=nUnscaled)
+
+        # only concerned about H1 spectra
+        unscaledH1s = self.unscaledSpectra.filter(regex=("-1 pSa \(g\)$"))
+        self.periods = self.unscaledSpectra['Period (sec)'].to_numpy()
+        self.unscaledH1 = unscaledH1s.to_numpy()
+        self.rsn = np.array([int(re.search('(\d+)', name).group(1))
+                             for name in unscaledH1s.columns])
+        self.rsnColumn = {rsn: j for j, rsn in enumerate(self.rsn)}
+
+        self.scaledSections = dict()
+        self.spectrumAverages = dict()
+
+        # damping of the computed spectra in use (None: PEER spectra)
+        self.computedDamping = None
+
+    # scaled section is only needed for its period column
+    def getScaledSpectra(self, scaledStart, nScaled):
+        if (scaledStart, nScaled) not in self.scaledSections:
+            self.scaledSections[(scaledStart, nScaled)] = pd.read_csv(
+                self.gmDir+self.resultsCSV, skiprows=scaledStart,
+                nrows=nScaled)
+        return(self.scaledSections[(scaledStart, nScaled)])
+
+    # geometric mean of each unscaled H1 spectrum over the period window
+    # independent of S1, so computed once per window
+    def getSpectrumAverages(self, scaledStart, nScaled, tLower, tUpper):
+        key = (scaledStart, nScaled, tLower, tUpper)
+        if key not in self.spectrumAverages:
+            targetPeriods = self.getScaledSpectra(scaledStart,
+                                                  nScaled)['Period (sec)']
+            unscaledH1s = self.unscaledSpectra.filter(regex=("-1 pSa \(g\)$"))
+            unscaledSpectraRange = unscaledH1s[targetPeriods.between(tLower, tUpper)]
+            self.spectrumAverages[key] = unscaledSpectraRange.prod()**(1/len(unscaledSpectraRange.index))
+        return(self.spectrumAverages[key])
+
+    # replace the PEER H1 spectra with ones computed from the AT2 records
+    # on the same period grid, so scaling and selection use our own pSa
+    # records missing from the summary keep the PEER values
+    # already computed at this damping: nothing to redo
+    def useComputedSpectra(self, damping=0.05):
+        if self.computedDamping == damping:
+            return(self)
+
+        from responseSpectrum import recordSpectra
+
+        h1Files     = self.summary.set_index(' Record Sequence Number')[
+            ' Horizontal-1 Acc. Filename'].str.strip().str.replace('.AT2', '',
+                                                                  regex=False)
+        cols        = [j for j, rsn in enumerate(self.rsn) if rsn in h1Files.index]
+        gmFiles     = [h1Files[self.rsn[j]] for j in cols]
+
+        computed    = recordSpectra(self.gmDir, gmFiles, self.periods, damping)
+        self.unscaledH1[:, cols] = computed.T
+
+        unscaledH1s = self.unscaledSpectra.filter(regex=("-1 pSa \(g\)$"))
+        self.unscaledSpectra[unscaledH1s.columns] = self.unscaledH1
+
+        # averages depend on the spectra
+        self.spectrumAverages = dict()
+        self.computedDamping = damping
+        return(self)
+
+    def getUnscaledSpectrum(self, rsn):
+        return(self.unscaledH1[:, self.rsnColumn[int(rsn)]])
+
+    # spectral ordinates of one or many records at one or many periods
+    # rsn: scalar -> periods is a vector, returns a vector
+    # rsn: (nRec,) -> periods is (nT,) shared or (nRec, nT) per record,
+    #      returns (nRec, nT)
+    # same linear interpolation (and end clamping) as np.interp
+    def getSpectralOrdinates(self, rsn, periods, scaleFactor=1.0):
+        single      = np.ndim(rsn) == 0
+        rsn         = np.atleast_1d(rsn)
+        cols        = np.array([self.rsnColumn[int(r)] for r in rsn])
+        Tquery      = np.asarray(periods, dtype=np.float64)
+        if Tquery.ndim < 2:
+            Tquery  = np.broadcast_to(Tquery, (len(cols), Tquery.size))
+
+        xp          = self.periods
+        fp          = self.unscaledH1[:, cols].T                # (nRec, nPeriod)
+
+        # bracketing period index for each query
+        j           = np.searchsorted(xp, Tquery, side='right') - 1
+        j           = np.clip(j, 0, len(xp) - 2)
+        recIdx      = np.arange(len(cols))[:,None]
+
+        slope       = ((fp[recIdx, j+1] - fp[recIdx, j]) /
+                       (xp[j+1] - xp[j]))
+        Sa          = slope*(Tquery - xp[j]) + fp[recIdx, j]
+
+        # exact period hits and clamping outside the period range
+        Sa          = np.where(Tquery == xp[j], fp[recIdx, j], Sa)
+        Sa          = np.where(Tquery <= xp[0], fp[:,:1], Sa)
+        Sa          = np.where(Tquery >= xp[-1], fp[:,-1:], Sa)
+
+        Sa          = np.asarray(scaleFactor, dtype=np.float64).reshape(-1,1)*Sa
+        if single:
+            return(Sa[0])
+        return(Sa)
+
+# one database per csv and section layout, per process
+databases = dict()
+
+def loadDatabase(gmDir, resultsCSV, summaryStart=33, nSummary=100,
+                 unscaledStart=258, nUnscaled=111):
+    key = (os.path.abspath(gmDir+resultsCSV), summaryStart, nSummary,
+           unscaledStart, nUnscaled)
+    if key not in databases:
+        databases[key] = GMDatabase(gmDir, resultsCSV, summaryStart, nSummary,
+                                    unscaledStart, nUnscaled)
+    return(databases[key])
+
 def cleanGMs(gmDir, resultsCSV, actualS1, summaryStart=33, nSummary=100, scaledStart=144, nScaled=111, unscaledStart=258, nUnscaled=111):
 
     # # remove all DT2 VT2 files
@@ -35,20 +171,18 @@ def cleanGMs(gmDir, resultsCSV, actualS1, summaryStart=33, nSummary=100, scaledS
     #   if item.endswith('.VT2') or item.endswith('.DT2'):
     #       os.remove(os.path.join(gmDir,item))
 
-    # load in sections of the sheet
-    summary             = pd.read_csv(gmDir+resultsCSV, 
-        skiprows=summaryStart, nrows=nSummary)
-    scaledSpectra       = pd.read_csv(gmDir+resultsCSV, 
-        skiprows=scaledStart, nrows=nScaled)
-    unscaledSpectra     = pd.read_csv(gmDir+resultsCSV, 
-        skiprows=unscaledStart, nrows=nUnscaled)
+    # sections of the sheet, parsed once
+    gmDatabase          = loadDatabase(gmDir, resultsCSV, summaryStart,
+        nSummary, unscaledStart, nUnscaled)
+    summary             = gmDatabase.summary
+    scaledSpectra       = gmDatabase.getScaledSpectra(scaledStart, nScaled)
 
     # Scale both Ss and S1
     # Create spectrum (Ss or S1/T)
     Ss          = 2.2815
     actualSs    = Ss
     Tshort      = actualS1/actualSs
-    targetSpectrum  = scaledSpectra[['Period (sec)']]
+    targetSpectrum  = scaledSpectra[['Period (sec)']].copy()
     targetSpectrum['Target pSa (g)'] = np.where(targetSpectrum['Period (sec)'] < Tshort, 
         actualSs, actualS1/targetSpectrum['Period (sec)'])
 
@@ -62,9 +196,8 @@ def cleanGMs(gmDir, resultsCSV, actualS1, summaryStart=33, nSummary=100, scaledS
     targetAverage = targetRange.prod()**(1/targetRange.size)
 
     # get the spectrum average for the unscaled GM spectra
-    unscaledH1s = unscaledSpectra.filter(regex=("-1 pSa \(g\)$"))       # only concerned about H1 spectra
-    unscaledSpectraRange = unscaledH1s[targetSpectrum['Period (sec)'].between(tLower, tUpper)]
-    unscaledAverages = unscaledSpectraRange.prod()**(1/len(unscaledSpectraRange.index))
+    unscaledAverages = gmDatabase.getSpectrumAverages(scaledStart, nScaled,
+        tLower, tUpper)
 
     # determine scale factor to get unscaled to target
     scaleFactorAverage = targetAverage/unscaledAverages
@@ -123,27 +256,114 @@ def cleanGMs(gmDir, resultsCSV, actualS1, summaryStart=33, nSummary=100, scaledS
 
     return(finalGM, targetAverage)
 
-def getST(gmDir, resultsCSV, GMFile, scaleFactor, Tquery, summaryStart=33, nSummary=100, unscaledStart=258, nUnscaled=111):
+def cleanGMsBatch(gmDir, resultsCSV, S1Array, summaryStart=33, nSummary=100, scaledStart=144, nScaled=111, unscaledStart=258, nUnscaled=111):
 
-    import re
+    # cleanGMs for every run's S1 in one pass
+    # returns one long table (column 'run' = position in S1Array) holding,
+    # for each run, exactly the rows and order cleanGMs would return, and
+    # the target spectrum averages as an array
+    # the window product is taken directly rather than in log space so the
+    # scale factors stay bit-identical to cleanGMs
 
-    # load in sections of the sheet
-    summary = pd.read_csv(gmDir+resultsCSV,
-        skiprows=summaryStart, nrows=nSummary)
-    unscaledSpectra = pd.read_csv(gmDir+resultsCSV,
-        skiprows=unscaledStart, nrows=nUnscaled)
+    gmDatabase          = loadDatabase(gmDir, resultsCSV, summaryStart,
+        nSummary, unscaledStart, nUnscaled)
+    scaledSpectra       = gmDatabase.getScaledSpectra(scaledStart, nScaled)
+
+    S1Array     = np.atleast_1d(np.asarray(S1Array, dtype=np.float64))
+    nRuns       = len(S1Array)
+
+    # calculate desired target spectrum average (0.2*Tm, 1.5*Tm)
+    tLower                  = 0.6
+    tUpper                  = 4.5
+
+    # target spectrum (Ss or S1/T) over the window, one row per run
+    Ss          = 2.2815
+    Tshort      = S1Array/Ss
+    periods     = scaledSpectra['Period (sec)']
+    windowT     = periods[periods.between(tLower, tUpper)].to_numpy()
+    targetRange = np.where(windowT[None,:] < Tshort[:,None],
+        Ss, S1Array[:,None]/windowT[None,:])
+
+    # geometric mean from Eads et al. (2015)
+    targetProd      = targetRange.prod(axis=1)
+    targetAverages  = np.array([prod**(1/windowT.size) for prod in targetProd])
+
+    # record metadata does not depend on S1: merge and filter once
+    unscaledAverages = gmDatabase.getSpectrumAverages(scaledStart, nScaled,
+        tLower, tUpper)
+    recordCols  = pd.DataFrame({'fullRSN': unscaledAverages.index,
+                                'column': np.arange(len(unscaledAverages))})
+    recordCols[' Record Sequence Number'] = recordCols['fullRSN'].str.extract('(\d+)')
+    recordCols  = recordCols.astype({' Record Sequence Number': int})
+    summary     = pd.merge(gmDatabase.summary, recordCols,
+        on=' Record Sequence Number')
+
+    # Filter by lowest usable frequency
+    freqMin     = 1/tUpper
+    eligFreq    = summary[summary[' Lowest Useable Frequency (Hz)'] < freqMin]
+    eligCol     = eligFreq['column'].to_numpy()
+
+    # determine scale factor to get unscaled to target (run x record)
+    scaleFactors = targetAverages[:,None]/unscaledAverages.to_numpy()[None,eligCol]
+
+    # Select earthquakes that are least severely scaled (3 per earthquake)
+    # cleanGMs prepends each earthquake, so walk them in reverse
+    eqNames     = eligFreq[' Earthquake Name'].to_numpy()
+    uniqEqs     = pd.unique(eqNames)
+    selected    = []
+    for earthquake in uniqEqs[::-1]:
+        members         = np.flatnonzero(eqNames == earthquake)
+        scaleDifference = abs(scaleFactors[:,members] - 1.0)
+        order           = np.argsort(scaleDifference, axis=1,
+                                     kind='quicksort')[:,:3]
+        selected.append(members[order])
+    selected    = np.hstack(selected)
+
+    nSel        = selected.shape[1]
+    runIdx      = np.repeat(np.arange(nRuns), nSel)
+    recIdx      = selected.ravel()
+
+    finalGM     = pd.DataFrame({
+        'run'               : runIdx,
+        'RSN'               : eligFreq[' Record Sequence Number'].to_numpy()[recIdx],
+        'scaleFactorSpecAvg': scaleFactors[runIdx, recIdx],
+        'EQName'            : eqNames[recIdx],
+        'lowestFreq'        : eligFreq[' Lowest Useable Frequency (Hz)'].to_numpy()[recIdx],
+        'filename'          : eligFreq[' Horizontal-1 Acc. Filename'].str.strip().to_numpy()[recIdx],
+    })
+
+    return(finalGM, targetAverages)
+
+def getST(gmDir, resultsCSV, GMFile, scaleFactor, Tquery, summaryStart=33, nSummary=100, unscaledStart=258, nUnscaled=111):
+
+    # query against the in-memory database
+    gmDatabase          = loadDatabase(gmDir, resultsCSV, summaryStart,
+        nSummary, unscaledStart, nUnscaled)
 
     rsn                 = re.search('(\d+)', GMFile).group(1)
-    gmUnscaledName      = 'RSN-' + str(rsn) + ' Horizontal-1 pSa (g)'
-    gmSpectrum          = unscaledSpectra[['Period (sec)', gmUnscaledName]]
-    gmSpectrum.columns  = ['Period', 'Sa']
+    gmSpectrum          = gmDatabase.getUnscaledSpectrum(rsn)
 
-    SaQueryUnscaled     = np.interp(Tquery, gmSpectrum.Period, gmSpectrum.Sa)
+    SaQueryUnscaled     = np.interp(Tquery, gmDatabase.periods, gmSpectrum)
     SaQuery             = scaleFactor*SaQueryUnscaled
     return(SaQuery)
 
 
 
+def getSpectralOrdinates(gmDir, resultsCSV, GMFiles, scaleFactors, Tquery, summaryStart=33, nSummary=100, unscaledStart=258, nUnscaled=111):
+
+    # batched getST: one record name (or many) against a vector of periods
+    # (or one period row per record), interpolated on the preloaded spectra
+    gmDatabase          = loadDatabase(gmDir, resultsCSV, summaryStart,
+        nSummary, unscaledStart, nUnscaled)
+
+    if isinstance(GMFiles, str):
+        rsn             = int(re.search('(\d+)', GMFiles).group(1))
+    else:
+        rsn             = np.array([int(re.search('(\d+)', gmFile).group(1))
+                                    for gmFile in GMFiles])
+
+    return(gmDatabase.getSpectralOrdinates(rsn, Tquery, scaleFactors))
+
 # Specify locations
 if __name__ == '__main__':
     summaryStart        = 32
@@ -0,0 +1,348 @@
+############################################################################
+#               Parallel run engine
+
+# Created by:   Huy Pham
+#               University of California, Berkeley
+
+# Date created: October 2026
+
+# Description:  Fans LHS rows out to a pool of worker processes
+#               Each run gets a freshly forked OpenSees interpreter; each run
+#               carries a RunContext and keeps its response envelopes in
+#               memory (no time histories on disk) unless an archive
+#               folder is given
+#               GM selection is drawn in the parent, before any run: either
+#               from one seeded stream in LHS order (as the serial loop), or
+#               from a generator per LHS row seeded by (seed, row), so a
+#               row's record does not depend on any other row
+#               Results are gathered back in LHS order
+#               Each LHS index is checkpointed (finished, failed, skipped) in
+#               the results store; resume=True continues a stopped database
+#               and gives the same final table as an uninterrupted run
+
+# Open issues:  (1) workers are forked; spawn would rerun runControl
+
+############################################################################
+
+import os, os.path
+import glob
+import shutil
+import random
+import multiprocessing as mp
+
+import numpy as np
+import pandas as pd
+
+import gmSelector
+from resultsStore import ResultsStore
+
+############################################################################
+#              File management
+############################################################################
+
+# remove existing results
+# explanation here: https://stackoverflow.com/a/31989328
+def remove_thing(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+def empty_directory(path):
+    for i in glob.glob(os.path.join(path, '*')):
+        remove_thing(i)
+
+############################################################################
+#              Single run
+############################################################################
+
+def performRun(runInfo):
+
+    # runInfo is built by prepareRuns, in LHS order
+    (index, inputVariables, row, filename, defFactor, specAvg,
+     gmPath, PEERSummary, computeSpectra, outputRoot, archiveDir) = runInfo
+
+    import eqAnly as eq
+    import postprocessing
+    from runContext import RunContext
+    from runArchive import RunArchive
+
+    # params travel in memory; each run records into its own folder
+    param   = dict(zip(inputVariables, row))   # relies on ordering from LHS.py
+    ctx     = RunContext(param, gmDir=gmPath,
+                         outputDir=os.path.join(outputRoot, 'run_'+str(index)))
+    ctx.runId   = index
+
+    # GMST/GMSTm read the same spectra the scale factor came from
+    useSpectra(gmPath, PEERSummary, computeSpectra)
+
+    # envelopes only, unless the full histories are archived
+    if archiveDir is None:
+        recordMode  = 'envelope'
+    else:
+        recordMode  = 'csv'
+        ctx.archive = RunArchive(archiveDir)
+
+    try:
+        runStatus, Tfb, scaleFactor = eq.runGM(filename, defFactor, 0.005, ctx,
+                                               recordMode=recordMode) # perform analysis (superStructDesign and buildModel imported within)
+    except ValueError:
+        print('Bearing solver returned negative friction coefficients. Skipping...')
+        return(index, None, None)
+    except IndexError:
+        print('SCWB check failed, no shape exists for design. Skipping...')
+        return(index, None, None)
+
+    # non-converging steps are sub-stepped inside runGM (down to dt/10)
+    if runStatus != 0:
+        print('Recording run and moving on.')
+
+    # add run results to holder df
+    resultsHeader, thisRun  = postprocessing.failurePostprocess(filename,
+                                                                scaleFactor,
+                                                                specAvg,
+                                                                runStatus,
+                                                                Tfb, ctx)
+
+    # csv histories now live in the archive
+    if archiveDir is not None:
+        shutil.rmtree(ctx.outputDir, ignore_errors=True)
+
+    return(index, runStatus, thisRun)
+
+############################################################################
+#              Run preparation
+############################################################################
+
+# computeSpectra = True: scale and report against spectra computed from the
+# records instead of the PEER ones; applied in every process that reads the
+# GM database (parent before the draws, each run before postprocessing)
+def useSpectra(gmPath, PEERSummary, computeSpectra):
+    if computeSpectra:
+        gmSelector.loadDatabase(gmPath, PEERSummary, 32, 133, 290,
+                                111).useComputedSpectra()
+
+# record drawn for one LHS row, from that row's own generator
+def rowGMIndex(seed, index, nChoices):
+    return(int(np.random.default_rng([seed, index]).integers(nChoices)))
+
+def assignGMs(inputVariables, inputValues, gmPath, PEERSummary, seed=985,
+              computeSpectra=False, rng=None, perRow=False):
+
+    # GM choice happens here, over every LHS row, before any run
+    # perRow = False: one random stream, consumed exactly as in the original
+    # run loop; rng: a random.Random to draw from instead (e.g. a saved state)
+    # perRow = True: each row draws from its own (seed, row) generator
+    if (rng is None) and not perRow:
+        rng = random.Random(seed)
+
+    # optionally scale against spectra computed from the records themselves
+    useSpectra(gmPath, PEERSummary, computeSpectra)
+
+    # selected records and scale factors for every row's S1 at once
+    S1Index         = list(inputVariables).index('S1')
+    S1Array         = np.asarray(inputValues)[:,S1Index]
+    selection, specAvgs     = gmSelector.cleanGMsBatch(gmPath, PEERSummary,
+        S1Array, 32, 133, 176, 111, 290, 111)
+    selection       = selection.drop(columns=['run'])
+    nSel            = len(selection.index)//len(S1Array)
+
+    assignment = []
+    for index in range(len(S1Array)):
+
+        gmDatabase      = selection.iloc[index*nSel:(index+1)*nSel].reset_index(drop=True)
+        specAvg         = specAvgs[index]
+
+        # for each input file, run a random GM in the database
+        if perRow:
+            ind         = rowGMIndex(seed, index, len(gmDatabase.index))
+        else:
+            ind         = rng.randrange(len(gmDatabase.index))
+
+        filename        = str(gmDatabase['filename'][ind])                  # ground motion name
+        filename        = filename.replace('.AT2', '')                      # remove extension from file name
+        defFactor       = float(gmDatabase['scaleFactorSpecAvg'][ind])      # scale factor used, either scaleFactorS1 or scaleFactorSpecAvg
+
+        assignment.append({'index': index, 'filename': filename,
+                           'defFactor': defFactor, 'specAvg': specAvg})
+
+    # also return the GM list of the last LHS row (kept with the session)
+    gmAssignment = pd.DataFrame(assignment).set_index('index')
+    return(gmAssignment, gmDatabase)
+
+# GM list of one LHS row, as the serial loop had it at that row
+def rowGMList(inputVariables, inputValues, index, gmPath, PEERSummary,
+              computeSpectra=False):
+    useSpectra(gmPath, PEERSummary, computeSpectra)
+    S1Index         = list(inputVariables).index('S1')
+    selection, specAvgs     = gmSelector.cleanGMsBatch(gmPath, PEERSummary,
+        [np.asarray(inputValues)[index, S1Index]], 32, 133, 176, 111, 290, 111)
+    return(selection.drop(columns=['run']).reset_index(drop=True))
+
+def prepareRuns(inputVariables, inputValues, gmAssignment, gmPath,
+                outputRoot='./outputs/', archiveDir=None, done=(),
+                PEERSummary='combinedSearch.csv', computeSpectra=False):
+
+    for index, gm in gmAssignment.iterrows():
+
+        # already handled before a restart
+        if index in done:
+            continue
+
+        # move on to next set if bad friction coeffs encountered (handled in superStructDesign)
+        if gm['defFactor'] >= 20.0:
+            print('Run ' + str(index) + ': ground motion scaled excessively. Skipping...')
+            continue
+
+        yield(index, inputVariables, inputValues[index], gm['filename'],
+              gm['defFactor'], gm['specAvg'], gmPath, PEERSummary,
+              computeSpectra, outputRoot, archiveDir)
+
+############################################################################
+#              Session checkpoint
+############################################################################
+
+# keep what a restart needs next to the results: LHS samples, screened GM
+# assignment, last GM list and how the GMs were drawn: the stream's state
+# before the draws (random.Random.getstate(), so assignGMs(rng=...) can
+# redraw the table) or the per-row seed (assignGMs(seed=..., perRow=True)),
+# and which spectra the scale factors came from (computeSpectra)
+def saveSession(resultsFile, inputVariables, inputValues, gmAssignment,
+                gmDatabase, rngState=None, gmSeed=None, computeSpectra=False):
+    store   = ResultsStore(resultsFile)
+    inputs  = pd.DataFrame(np.asarray(inputValues), columns=list(inputVariables))
+    store.saveSession({'inputs': inputs,
+                       'gmAssignment': gmAssignment.reset_index(),
+                       'gmDatabase': gmDatabase},
+                      {'rngState': rngState, 'gmSeed': gmSeed,
+                       'computeSpectra': bool(computeSpectra)})
+    store.close()
+
+# inputs of the stored session, or None if there is none
+# returns inputVariables, inputValues, gmAssignment, gmDatabase, rngState,
+# gmSeed, computeSpectra
+def loadSession(resultsFile):
+    store   = ResultsStore(resultsFile)
+    session = store.loadSession()
+    store.close()
+    if session is None:
+        return(None)
+
+    frames, values  = session
+    inputs          = frames['inputs']
+    gmAssignment    = frames['gmAssignment'].set_index('index')
+    rngState        = values['rngState']
+    if rngState is not None:
+        rngState    = (rngState[0], tuple(rngState[1]), rngState[2])
+    return(list(inputs.columns), inputs.to_numpy(), gmAssignment,
+           frames['gmDatabase'], rngState, values['gmSeed'],
+           values.get('computeSpectra', False))
+
+############################################################################
+#              Database generation
+############################################################################
+
+# last LHS row the serial loop would have handled: the run that reached
+# desired_pts, or the last row if the database stopped short of it
+def lastRunIndex(resultsFile, nRows, desired_pts):
+    store       = ResultsStore(resultsFile)
+    statuses    = store.runStatuses()
+    store.close()
+    converged   = statuses.loc[statuses['runStatus'].isin([0, -3, -4]),
+                               'runId'].sort_values()
+    if len(converged) >= desired_pts:
+        return(int(converged.iloc[desired_pts-1]))
+    return(nRows - 1)
+
+def runDatabase(inputVariables, inputValues, desired_pts, gmAssignment,
+                gmPath, nWorkers=None, outputRoot='./outputs/',
+                resultsFile='./sessionOut/sessionSummary.db',
+                archiveDir=None, resume=False, freshWorkers=True,
+                PEERSummary='combinedSearch.csv', computeSpectra=False):
+
+    # gmAssignment comes from assignGMs (optionally screened), in LHS order
+    # archiveDir: keep every run's full histories there (runArchive.py)
+    # every run is committed to resultsFile as it arrives (resultsStore.py)
+    # resume: keep the stored runs and skip every index with a status
+    # freshWorkers: one forked worker per run; OpenSees keeps solver state
+    # between analyses (the eigen start vector), so otherwise a run's last
+    # digits depend on what its process ran before (restarts, nWorkers)
+    # computeSpectra: as given to assignGMs (saved with the session)
+    if nWorkers is None:
+        nWorkers = os.cpu_count()
+
+    store       = ResultsStore(resultsFile)
+    if resume:
+        statuses    = store.runStatuses()
+        done        = set(statuses['runId'])
+        pt_counter  = int(statuses['runStatus'].isin([0, -3, -4]).sum())
+        print('Resuming: ' + str(len(done)) + ' runs checkpointed, ' +
+              str(pt_counter) + ' converged.')
+    else:
+        # new database, appended one run at a time
+        store.clear()
+        done        = set()
+        pt_counter  = 0
+
+    # screened out or excessively scaled rows never run
+    runnable    = gmAssignment.index[gmAssignment['defFactor'] < 20.0]
+    skipped     = [index for index in range(len(inputValues))
+                   if (index not in runnable) and (index not in done)]
+    store.markRuns(skipped, 'skipped')
+
+    # workers fork with the spectra already in place
+    useSpectra(gmPath, PEERSummary, computeSpectra)
+    runs = prepareRuns(inputVariables, inputValues, gmAssignment, gmPath,
+                       outputRoot=outputRoot, archiveDir=archiveDir, done=done,
+                       PEERSummary=PEERSummary, computeSpectra=computeSpectra)
+
+    # stop condition already met before the restart
+    if pt_counter >= desired_pts:
+        runs = iter(())
+
+    if (nWorkers <= 1) and not freshWorkers:
+        pool    = None
+        results = map(performRun, runs)
+    else:
+        # fork so workers do not re-import the calling script
+        if 'fork' in mp.get_all_start_methods():
+            mpContext = mp.get_context('fork')
+        else:
+            mpContext = mp.get_context()
+        pool    = mpContext.Pool(max(nWorkers, 1),
+                                 maxtasksperchild=1 if freshWorkers else None)
+        results = pool.imap(performRun, runs)
+
+    try:
+        for index, runStatus, thisRun in results:
+
+            print('The run index is ' + str(index) + '.') # run counter
+
+            if thisRun is None:
+                store.markRuns([index], 'failed')
+                continue
+
+            # adapted to accept non-convergence
+            # collapse stops (-4) count as the -3 runs they used to end as
+            if runStatus == 0:
+                pt_counter += 1
+            elif runStatus in (-3, -4):
+                pt_counter += 1
+
+            print('Converged runs: ' + str(pt_counter) + '.') # run counter
+
+            # add results onto the store, saved as they come
+            store.append(thisRun, runId=index, runStatus=runStatus)
+
+            if (pt_counter == desired_pts):
+                break
+    finally:
+        # runs past the stop condition are discarded
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    # newest run first, as the old accumulated dataframe
+    resultsDf   = store.read()
+    store.close()
+    return(resultsDf)
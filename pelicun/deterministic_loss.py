@@ -0,0 +1,524 @@
+############################################################################
+#               Loss estimation for deterministic demands
+
+# Created by:   Huy Pham
+#               University of California, Berkeley
+
+# Date created: October 2026
+
+# Description:  Reduced-sample alternative to estimate_damage(mode='generate')
+# Demands of a database run are single values, so every one of the 10,000
+# pelicun demand realizations is the same. Here the damage state
+# probabilities of each component are taken directly from the fragility
+# CDFs at those values; collapse and irreparable (residual drift)
+# probabilities are exact. Only component quantities, the damage state
+# drawn from those probabilities and the repair consequences are sampled,
+# with plain arrays and a much smaller sample.
+# Uses the same P58 tables, component model, damage process and
+# replacement consequences as estimate_loss.py
+
+# Open issues:  (1) fragility and consequence families: lognormal, normal
+#               (Theta_1 taken as COV) or deterministic; other data raise
+#               ValueError so the caller can fall back to estimate_damage
+#               (2) limit states of a block are perfectly correlated,
+#               blocks and consequences are independent given the demand,
+#               economies of scale across floors and damage states (pelicun
+#               defaults); blocks reading the same residual drift share its
+#               realization, so their probabilities are integrated over it
+#               (3) residual drift components with repair consequences raise
+#               ValueError (their damage is tied to the irreparable state)
+#               (4) compare_deterministic_loss.py checks it against
+#               estimate_damage; not yet run against pelicun, so
+#               loss_driver.run_loss does not use this module
+
+############################################################################
+import numpy as np
+
+import pandas as pd
+idx = pd.IndexSlice
+
+from scipy.stats import norm, multivariate_normal
+
+from estimate_loss import (new_assessment, cached, get_P58_metadata,
+                           get_P58_fragility, get_P58_repair,
+                           get_structural_cmp, get_additional_fragility_db,
+                           get_additional_consequences, summarize_loss_by_cmp,
+                           sample_until_converged,
+                           delta_y, demand_offset, nondir_multi,
+                           replacement_cost, replacement_time)
+
+# stories, for the location keywords of the component model
+n_stories = 3
+
+# dispersion pelicun's estimate_RID adds to nonzero residual drifts
+# (FEMA P58 Vol. 1, Appendix C)
+rid_beta = 0.2
+
+# standard normal grid and weights for expectations over that scatter
+rid_eps = np.linspace(-8.0, 8.0, 3201)
+rid_weights = norm.pdf(rid_eps)*(rid_eps[1] - rid_eps[0])
+
+# pelicun demand type names -> EDP types in the demand table
+demand_types = {'Peak Interstory Drift Ratio': 'PID',
+                'Story Drift Ratio': 'PID',
+                'Peak Floor Acceleration': 'PFA',
+                'Peak Floor Velocity': 'PFV',
+                'Residual Interstory Drift Ratio': 'RID',
+                'Residual Drift Ratio': 'RID',
+                'Peak Spectral Acceleration': 'SA'}
+
+# SI factors of the units found in the demand, component and repair tables
+unit_factors = {'g': 9.80665, 'mps2': 1.0, 'inps2': 0.0254, 'ftps2': 0.3048,
+                'mps': 1.0, 'inps': 0.0254, 'ftps': 0.3048, 'cmps': 0.01,
+                'rad': 1.0, 'unitless': 1.0,
+                'ea': 1.0, 'in': 0.0254, 'ft': 0.3048, 'lf': 0.3048,
+                'm': 1.0, 'ft2': 0.3048**2, 'sf': 0.3048**2, 'm2': 1.0,
+                'ap': 1.0, 'ton': 1.0}      # amps, tons: only against themselves
+
+def unit_factor(unit):
+    try:
+        return(unit_factors[str(unit).strip().lower()])
+    except KeyError:
+        raise ValueError('Unit not supported: ' + str(unit))
+
+# '100 SF' -> SI size of one consequence quantity
+def quantity_factor(quantity_unit):
+    parts = str(quantity_unit).split()
+    if len(parts) == 1:
+        return(unit_factor(parts[0]))
+    return(float(parts[0])*unit_factor(parts[1]))
+
+# location and direction keywords of the component model, as pelicun
+def get_locations(loc_str):
+    loc_str = str(loc_str)
+    if '--' in loc_str:
+        low, high = loc_str.split('--')
+        return([str(loc) for loc in range(int(get_locations(low)[0]),
+                                          int(get_locations(high)[0]) + 1)])
+    if ',' in loc_str:
+        return([str(int(loc)) for loc in loc_str.split(',')])
+    if loc_str == 'all':
+        return([str(loc) for loc in range(1, n_stories + 1)])
+    if loc_str == 'top':
+        return([str(n_stories)])
+    if loc_str == 'roof':
+        return([str(n_stories + 1)])
+    return([str(int(float(loc_str)))])
+
+def get_directions(dir_str):
+    if pd.isnull(dir_str):
+        return(['1'])
+    return(get_locations(dir_str))
+
+# P(capacity < demand) for one limit state
+def exceedance(family, theta_0, theta_1, demand):
+    if family == 'lognormal':
+        if demand <= 0.0:
+            return(0.0)
+        return(norm.cdf(np.log(demand/theta_0)/theta_1))
+    if family == 'normal':
+        return(norm.cdf((demand - theta_0)/(theta_1*theta_0)))
+    if pd.isnull(family):
+        return(float(demand >= theta_0))
+    raise ValueError('Fragility family not supported: ' + str(family))
+
+# median residual drift of estimate_RID for a peak drift
+def median_rid(pid):
+    if pid < delta_y:
+        return(0.0)
+    elif pid < 4*delta_y:
+        return(0.3*(pid - delta_y))
+    return(pid - 3*delta_y)
+
+# P(capacity < min(PID, RID)) for a residual drift fragility, with the
+# lognormal RID scatter of estimate_RID
+def rid_exceedance(theta_0, theta_1, pid):
+    rid = median_rid(pid)
+    if rid <= 0.0:
+        return(0.0)
+
+    # X = ln(capacity), Y = ln(RID): P(X < Y and X < ln(PID))
+    mean = [np.log(theta_0) - np.log(rid), np.log(theta_0)]
+    cov = [[theta_1**2 + rid_beta**2, theta_1**2],
+           [theta_1**2, theta_1**2]]
+    return(multivariate_normal(mean, cov).cdf([0.0, np.log(pid)]))
+
+# damage state probabilities of one block
+# limit states use the same capacity quantile (sequential damage states);
+# damage state weights split a limit state into exclusive damage states
+def ds_probabilities(fragility, demand, rid_pid=None):
+    ls_exceed = []
+    ls_weights = []
+    for ls in range(1, 5):
+        ls_name = 'LS' + str(ls)
+        if ((ls_name, 'Theta_0') not in fragility.index or
+            pd.isnull(fragility[(ls_name, 'Theta_0')])):
+            break
+        theta_0 = float(fragility[(ls_name, 'Theta_0')])
+        theta_1 = float(fragility.get((ls_name, 'Theta_1'), np.nan))
+        family = fragility.get((ls_name, 'Family'), np.nan)
+        if rid_pid is not None:
+            if family != 'lognormal':
+                raise ValueError('Residual drift fragility must be lognormal')
+            ls_exceed.append(rid_exceedance(theta_0, theta_1, rid_pid))
+        else:
+            ls_exceed.append(exceedance(family, theta_0, theta_1, demand))
+        weights = fragility.get((ls_name, 'DamageStateWeights'), np.nan)
+        if pd.isnull(weights):
+            ls_weights.append([1.0])
+        else:
+            ls_weights.append([float(w) for w in str(weights).split('|')])
+
+    # P(LS >= k) is the largest exceedance of LS k and above
+    at_least = np.maximum.accumulate(np.array(ls_exceed)[::-1])[::-1]
+    ls_prob = at_least - np.append(at_least[1:], 0.0)
+
+    ds_prob = [1.0 - at_least[0] if len(at_least) else 1.0]
+    for prob, weights in zip(ls_prob, ls_weights):
+        ds_prob += [prob*w for w in weights]
+    return(np.clip(np.array(ds_prob), 0.0, 1.0))
+
+# P(any limit state) of a lognormal fragility, for an array of demands
+def any_exceedance(fragility, demand):
+    exceed = np.zeros(np.shape(demand))
+    for ls in range(1, 5):
+        ls_name = 'LS' + str(ls)
+        if ((ls_name, 'Theta_0') not in fragility.index or
+            pd.isnull(fragility[(ls_name, 'Theta_0')])):
+            break
+        exceed = np.maximum(exceed, norm.cdf(
+            np.log(demand/float(fragility[(ls_name, 'Theta_0')]))/
+            float(fragility[(ls_name, 'Theta_1')])))
+    return(exceed)
+
+# P(no damage in any block) of groups reading one residual drift column:
+# estimate_RID draws one RID per realization and column, shared by all of
+# their blocks, so the blocks are independent only given that RID
+def rid_no_damage(rid_groups, pid):
+    rid = median_rid(pid)
+    if rid <= 0.0:
+        return(1.0)
+    rid_values = np.minimum(rid*np.exp(rid_beta*rid_eps), pid)
+    no_damage = np.ones(len(rid_eps))
+    for group in rid_groups:
+        no_damage *= (1.0 - any_exceedance(group['fragility'],
+                                           rid_values))**group['blocks']
+    return(float(np.sum(no_damage*rid_weights)))
+
+# multilinear median: '190.0, 150.0|1,5' (medians|quantities) or a number
+def median_function(theta_0):
+    if isinstance(theta_0, str) and '|' in theta_0:
+        medians, qnts = theta_0.split('|')
+        medians = np.array(medians.split(','), dtype=float)
+        qnts = np.array(qnts.split(','), dtype=float)
+        return(lambda eco_qnt: np.interp(eco_qnt, qnts, medians))
+    median = float(theta_0)
+    return(lambda eco_qnt: np.full(np.shape(eco_qnt), median))
+
+def consequence_factor(rng, family, theta_1, n_sample):
+    if pd.isnull(family):
+        return(np.ones(n_sample))
+    if family == 'lognormal':
+        return(np.exp(rng.normal(scale=float(theta_1), size=n_sample)))
+    if family == 'normal':
+        return(np.maximum(rng.normal(1.0, float(theta_1), size=n_sample), 0.0))
+    raise ValueError('Consequence family not supported: ' + str(family))
+
+# performance groups and their damage state probabilities at the run's
+# demands, with the exact replacement probabilities
+# raw_demands: (type, loc, dir) x ['Units', 'Value'], as for estimate_damage
+def get_performance_model(raw_demands, run_data, cmp_marginals):
+
+    PAL = new_assessment()      # only reads the default data
+
+    ###########################################################################
+    # DEMANDS
+    ###########################################################################
+
+    # fixed demands in SI, keyed by (type, loc, dir)
+    edp = {}
+    for (edp_type, loc, direction), row in raw_demands.iterrows():
+        edp[(edp_type, str(loc), str(direction))] = (
+            float(row['Value'])*unit_factor(row['Units']))
+    edp[('SA_Tm', '0', '1')] = float(run_data['GMSTm'])*unit_factor('g')
+    edp[('PID_all', '0', '1')] = max(edp[('PID', str(loc), '1')]
+                                     for loc in range(1, n_stories + 1))
+
+    def get_demand(edp_type, loc, direction):
+        if direction == '0':
+            values = [value for key, value in edp.items()
+                      if key[:2] == (edp_type, loc)]
+            if not values:
+                raise ValueError('No demand for ' + edp_type + '-' + loc)
+            return(max(values)*nondir_multi)
+        return(edp[(edp_type, loc, direction)])
+
+    ###########################################################################
+    # COMPONENTS AND DAMAGE STATE PROBABILITIES
+    ###########################################################################
+
+    P58_metadata = get_P58_metadata(PAL)
+    cmp_structural = get_structural_cmp(run_data, P58_metadata)
+    cmp_marginals = pd.concat([cmp_structural, cmp_marginals], axis=0)
+    cmp_list = cmp_marginals.index.unique().values[:-3]
+
+    P58_data = get_P58_fragility(PAL)
+    additional_fragility_db = cached(
+        ('additional_fragility', tuple(cmp_list)),
+        lambda: get_additional_fragility_db(P58_data, cmp_list))
+
+    # first definition of a component wins, as in load_damage_model
+    fragility_db = pd.concat([additional_fragility_db, P58_data], axis=0)
+    fragility_db = fragility_db.loc[~fragility_db.index.duplicated(keep='first')]
+
+    additional_consequences, incomplete_cmp = cached(
+        'additional_consequences', get_additional_consequences)
+    repair_db = pd.concat([additional_consequences, incomplete_cmp,
+                           get_P58_repair(PAL)], axis=0)
+    repair_db = repair_db.loc[~repair_db.index.duplicated(keep='first')]
+
+    # one performance group per component, location and direction
+    groups = []
+    for cmp_id, marginal in cmp_marginals.iterrows():
+        if cmp_id not in fragility_db.index:
+            raise ValueError('No fragility data for ' + cmp_id)
+        fragility = fragility_db.loc[cmp_id]
+        demand_type = str(fragility[('Demand', 'Type')])
+        edp_type = demand_types.get(demand_type.split('|')[0])
+        if edp_type is None:
+            raise ValueError('Demand type not supported: ' + demand_type)
+        if '|' in demand_type:
+            edp_type += '_' + demand_type.split('|')[1]
+        offset = int(demand_offset.get(edp_type,
+                                       fragility[('Demand', 'Offset')]))
+        directional = int(fragility[('Demand', 'Directional')]) == 1
+        demand_unit = fragility[('Demand', 'Unit')]
+
+        blocks = marginal['Blocks']
+        blocks = 1 if pd.isnull(blocks) else int(blocks)
+
+        for loc in get_locations(marginal['Location']):
+            for direction in get_directions(marginal['Direction']):
+                demand_loc = str(int(loc) + offset)
+                demand_dir = direction if directional else '0'
+
+                rid_column = None
+                if edp_type == 'RID':
+                    # residual drift is random even for a fixed peak drift
+                    if not directional:
+                        raise ValueError('Non-directional residual drift '
+                                         'fragility: ' + cmp_id)
+                    if (cmp_id, 'Cost') in repair_db.index:
+                        raise ValueError('Residual drift component with '
+                                         'repair consequences: ' + cmp_id)
+                    rid_column = (demand_loc, demand_dir)
+                    ds_prob = ds_probabilities(
+                        fragility, None,
+                        rid_pid=get_demand('PID', demand_loc, demand_dir))
+                else:
+                    # fragility medians are in the demand unit of the DB
+                    demand = (get_demand(edp_type, demand_loc, demand_dir)/
+                              unit_factor(demand_unit))
+                    ds_prob = ds_probabilities(fragility, demand)
+
+                groups.append({'cmp': cmp_id, 'loc': loc, 'dir': direction,
+                               'marginal': marginal, 'blocks': blocks,
+                               'ds_prob': ds_prob, 'fragility': fragility,
+                               'rid_column': rid_column})
+
+    n_ds = max(len(group['ds_prob']) for group in groups)
+    damage_probs = pd.DataFrame(
+        [np.pad(group['ds_prob'], (0, n_ds - len(group['ds_prob'])))
+         for group in groups],
+        index=pd.MultiIndex.from_tuples(
+            [(group['cmp'], group['loc'], group['dir']) for group in groups],
+            names=['cmp', 'loc', 'dir']),
+        columns=['DS'+str(ds) for ds in range(n_ds)])
+
+    ###########################################################################
+    # REPLACEMENT
+    ###########################################################################
+
+    # collapse clears all other damage (ALL_NA); any excessiveRID damage
+    # makes the building irreparable
+    # blocks at fixed demands are independent; blocks on one residual drift
+    # column share its realization (rid_no_damage); columns are independent
+    def any_damage(cmp_id):
+        cmp_groups = [group for group in groups if group['cmp'] == cmp_id]
+        no_damage = np.prod([group['ds_prob'][0]**group['blocks']
+                             for group in cmp_groups
+                             if group['rid_column'] is None])
+        rid_columns = {}
+        for group in cmp_groups:
+            if group['rid_column'] is not None:
+                rid_columns.setdefault(group['rid_column'], []).append(group)
+        for (demand_loc, demand_dir), rid_groups in rid_columns.items():
+            no_damage *= rid_no_damage(rid_groups,
+                                       get_demand('PID', demand_loc,
+                                                  demand_dir))
+        return(1.0 - no_damage)
+
+    collapse_freq = any_damage('collapse')
+    irreparable_given_standing = 1.0 - ((1.0 - any_damage('excessiveRID'))*
+                                        (1.0 - any_damage('irreparable')))
+    irreparable_freq = (1.0 - collapse_freq)*irreparable_given_standing
+
+    return({'groups': groups, 'cmp_list': cmp_list, 'repair_db': repair_db,
+            'damage_probs': damage_probs, 'collapse_freq': collapse_freq,
+            'irreparable_given_standing': irreparable_given_standing,
+            'irreparable_freq': irreparable_freq})
+
+# n_sample realizations of repair cost by component and agg_DF of a
+# performance model
+def sample_losses(model, rng, n_sample):
+
+    groups = model['groups']
+    repair_db = model['repair_db']
+
+    collapse = rng.random(n_sample) < model['collapse_freq']
+    irreparable = ((~collapse) &
+                   (rng.random(n_sample) <
+                    model['irreparable_given_standing']))
+    replaced = collapse | irreparable
+
+    ###########################################################################
+    # QUANTITIES, DAMAGE STATES AND CONSEQUENCES
+    ###########################################################################
+
+    # damaged quantities in consequence units, per group and damage state
+    damaged = []
+    eco_qnt = {}
+    for group in groups:
+        cmp_id = group['cmp']
+        if (cmp_id, 'Cost') not in repair_db.index:
+            continue
+        marginal = group['marginal']
+
+        # component quantity (realizations)
+        theta_0 = float(marginal['Theta_0'])
+        family = marginal['Family']
+        if pd.isnull(family):
+            qnt = np.full(n_sample, theta_0)
+        elif family == 'lognormal':
+            qnt = theta_0*np.exp(rng.normal(scale=float(marginal['Theta_1']),
+                                            size=n_sample))
+        elif family == 'normal':
+            qnt = np.maximum(rng.normal(theta_0,
+                                        float(marginal['Theta_1'])*theta_0,
+                                        size=n_sample), 0.0)
+        else:
+            raise ValueError('Quantity family not supported: ' + str(family))
+
+        # blocks in each damage state
+        ds_prob = group['ds_prob']
+        counts = rng.multinomial(group['blocks'], ds_prob/ds_prob.sum(),
+                                 size=n_sample)
+
+        qnt_factor = (unit_factor(marginal['Units'])/
+                      quantity_factor(repair_db.loc[(cmp_id, 'Cost'),
+                                                    ('Quantity', 'Unit')]))
+        for ds in range(1, len(ds_prob)):
+            if not counts[:, ds].any():
+                continue
+            dmg_qnt = counts[:, ds]*qnt/group['blocks']*qnt_factor
+            dmg_qnt[replaced] = 0.0
+            damaged.append((group, ds, dmg_qnt))
+            eco_qnt[cmp_id] = eco_qnt.get(cmp_id, 0.0) + dmg_qnt
+
+    # repair cost by component, repair time by location
+    cost_by_cmp = {}
+    time_by_loc = {}
+    for group, ds, dmg_qnt in damaged:
+        cmp_id = group['cmp']
+        ds_name = 'DS' + str(ds)
+        for dv in ['Cost', 'Time']:
+            if (cmp_id, dv) not in repair_db.index:
+                continue
+            consequence = repair_db.loc[(cmp_id, dv)]
+            if ((ds_name, 'Theta_0') not in consequence.index or
+                pd.isnull(consequence[(ds_name, 'Theta_0')])):
+                continue
+            median = median_function(consequence[(ds_name, 'Theta_0')])
+            factor = consequence_factor(rng,
+                                        consequence.get((ds_name, 'Family'), np.nan),
+                                        consequence.get((ds_name, 'Theta_1'), np.nan),
+                                        n_sample)
+            dv_sample = dmg_qnt*median(eco_qnt[cmp_id])*factor
+            if dv == 'Cost':
+                cost_by_cmp[cmp_id] = cost_by_cmp.get(cmp_id, 0.0) + dv_sample
+            else:
+                time_by_loc[group['loc']] = (time_by_loc.get(group['loc'], 0.0) +
+                                             dv_sample)
+
+    ###########################################################################
+    # LOSS
+    ###########################################################################
+
+    loss_by_cmp = pd.DataFrame(cost_by_cmp, index=range(n_sample))
+    loss_by_cmp['collapse'] = replacement_cost*collapse
+    loss_by_cmp['irreparable'] = replacement_cost*irreparable
+
+    time_by_loc = pd.DataFrame(time_by_loc, index=range(n_sample))
+
+    agg_DF = pd.DataFrame(index=range(n_sample),
+                          columns=pd.MultiIndex.from_tuples(
+                              [('repair_cost', ''),
+                               ('repair_time', 'parallel'),
+                               ('repair_time', 'sequential')]),
+                          dtype=float)
+    agg_DF[('repair_cost', '')] = loss_by_cmp.sum(axis=1).values
+    agg_DF[('repair_time', 'parallel')] = np.where(
+        replaced, replacement_time,
+        time_by_loc.max(axis=1).values if len(time_by_loc.columns) else 0.0)
+    agg_DF[('repair_time', 'sequential')] = np.where(
+        replaced, replacement_time, time_by_loc.sum(axis=1).values)
+
+    return(loss_by_cmp, agg_DF)
+
+# raw_demands: (type, loc, dir) x ['Units', 'Value'], as for estimate_damage
+# returns damage state probabilities, repair cost by component, loss_groups,
+# agg_DF, collapse_freq and irreparable_freq
+def estimate_damage_deterministic(raw_demands, run_data, cmp_marginals,
+                                  n_sample=1000, seed=985):
+
+    model = get_performance_model(raw_demands, run_data, cmp_marginals)
+    loss_by_cmp, agg_DF = sample_losses(model, np.random.default_rng(seed),
+                                        n_sample)
+
+    # sampled replacement frequencies are not used, the exact ones are
+    loss_groups = summarize_loss_by_cmp(loss_by_cmp, model['cmp_list'],
+                                        n_sample)[0]
+
+    # replacement frequencies are exact, not sampled
+    return(model['damage_probs'], loss_by_cmp, loss_groups, agg_DF,
+           model['collapse_freq'], model['irreparable_freq'])
+
+# same, with the consequence sample grown in blocks of block_size (block k
+# drawn from its own (seed, k) generator) until the mean repair cost and
+# times converge (sample_until_converged); the replacement frequencies are
+# exact, so their error is zero
+# returns damage state probabilities, repair cost by component, loss_groups,
+# agg_DF, collapse_freq, irreparable_freq, the sample size and the achieved
+# standard errors
+def estimate_damage_deterministic_adaptive(raw_demands, run_data,
+                                           cmp_marginals, block_size=250,
+                                           max_sample=10000, rel_tol=None,
+                                           abs_tol=None, seed=985):
+
+    model = get_performance_model(raw_demands, run_data, cmp_marginals)
+
+    def draw_block(block, size):
+        return(sample_losses(model, np.random.default_rng([seed, block]),
+                             size))
+
+    loss_by_cmp, agg_DF, n_sample, errors = sample_until_converged(
+        draw_block, block_size=block_size, max_sample=max_sample,
+        rel_tol=rel_tol, abs_tol=abs_tol, exact_replacement=True)
+
+    # sampled replacement frequencies are not used, the exact ones are
+    loss_groups = summarize_loss_by_cmp(loss_by_cmp, model['cmp_list'],
+                                        n_sample)[0]
+
+    return(model['damage_probs'], loss_by_cmp, loss_groups, agg_DF,
+           model['collapse_freq'], model['irreparable_freq'],
+           n_sample, errors)
@@ -114,119 +114,79 @@ def get_structural_cmp_MF(run_info, metadata):
         
     return(cmp_strct)
 
-def estimate_damage(raw_demands, run_data, cmp_marginals, mode='generate'):
-    
-    # initialize, no printing outputs, offset fixed with current components
-    PAL = Assessment({
-        "PrintLog": False, 
-        "Seed": 985,
-        "Verbose": False,
-        "DemandOffset": {"PFA": 0, "PFV": 0}
-    })
-    
-    ###########################################################################
-    # DEMANDS
-    ###########################################################################
-    if mode=='validation':
-        PAL.demand.load_sample(raw_demands)
-        PAL.demand.calibrate_model(
-            {
-                "ALL": {
-                    "DistributionFamily": "lognormal"
-                }
-            }
-        )
-    else:
-        # specify deterministic demands
-        demands = raw_demands
-        demands.insert(1, 'Family',"deterministic")
-        demands.rename(columns = {'Value': 'Theta_0'}, inplace=True)
-        
-        # prepare a correlation matrix that represents perfect correlation
-        ndims = demands.shape[0]
-        demand_types = demands.index 
-    
-        perfect_CORR = pd.DataFrame(
-            np.ones((ndims, ndims)),
-            columns = demand_types,
-            index = demand_types)
-    
-        # load the demand model
-        PAL.demand.load_model({'marginals': demands,
-                               'correlation': perfect_CORR})
-
-    # generate demand sample
-    n_sample = 10000
-    PAL.demand.generate_sample({"SampleSize": n_sample})
+###########################################################################
+# SHARED ASSESSMENT PIECES
+###########################################################################
 
-    # extract the generated sample
-    # Note that calling the save_sample() method is better than directly pulling the 
-    # sample attribute from the demand object because the save_sample method converts
-    # demand units back to the ones you specified when loading in the demands.
-    demand_sample = PAL.demand.save_sample()
+# yield drift found from typical pushover curve for structure
+delta_y = 0.0075
+
+# offset fixed with current components (floor of the demand = floor of the
+# component)
+demand_offset = {"PFA": 0, "PFV": 0}
+
+# non-directional components see the larger of the two directional demands
+# times this factor (pelicun's default NonDirectionalMultipliers), given
+# explicitly so deterministic_loss uses the same value
+nondir_multi = 1.2
+
+# use PACT
+# assume $250/sf
+# assume 40% of replacement cost is labor, $680/worker-day for SF Bay Area
+replacement_cost = 250.0*90.0*90.0*4
+replacement_time = replacement_cost*0.4/680.0
+
+# FEMA P58 uses the following process:
+dmg_process = {
+    "1_collapse": {
+        "DS1": "ALL_NA"
+    },
+    "2_excessiveRID": {
+        "DS1": "irreparable_DS1"
+    }
+}
 
+# tables that are the same for every run, kept for the life of the process:
+# P58 fragility/repair data and metadata, the additional fragility and
+# consequence tables and the structural components of each beam/col pair
+db_cache = dict()
 
-    # get residual drift estimates 
-    delta_y = 0.0075 # found from typical pushover curve for structure
-    PID = demand_sample['PID']
+def cached(key, build):
+    if key not in db_cache:
+        db_cache[key] = build()
+    return(db_cache[key])
 
-    RID = PAL.demand.estimate_RID(PID, {'yield_drift': delta_y}) 
+def get_P58_metadata(PAL):
+    return(cached('P58_metadata', lambda: PAL.get_default_metadata(
+        'fragility_DB_FEMA_P58_2nd')))
 
-    # and join them with the demand_sample
-    demand_sample_ext = pd.concat([demand_sample, RID], axis=1)
+def get_P58_fragility(PAL):
+    return(cached('P58_fragility', lambda: PAL.get_default_data(
+        'fragility_DB_FEMA_P58_2nd')))
 
-    # add spectral acceleration at fundamental period (BEARING EFFECTIVE PERIOD)
-    # does Sa(T) characterize this well considering impact? for now, try using peak acceleration
-    # demand_sample_ext[('SA_Tm',0,1)] = max(run_data['accMax0'],
-    #                                        run_data['accMax1'],
-    #                                        run_data['accMax2'],
-    #                                        run_data['accMax3'])
-
-    demand_sample_ext[('SA_Tm',0,1)] = run_data['GMSTm']
-    
-    demand_sample_ext[('PID_all',0,1)] = demand_sample_ext[[('PID','1','1'),
-                                                            ('PID','2','1'),
-                                                            ('PID','3','1')]].max(axis=1)
-    
-    # add units to the data 
-    demand_sample_ext.T.insert(0, 'Units',"")
-
-    # PFA and SA are in "g" in this example, while PID and RID are "rad"
-    demand_sample_ext.loc['Units', ['PFA', 'SA_Tm']] = 'g'
-    demand_sample_ext.loc['Units',['PID', 'PID_all', 'RID']] = 'rad'
-    demand_sample_ext.loc['Units',['PFV']] = 'inps'
-
-
-    PAL.demand.load_sample(demand_sample_ext)
-    
-    ###########################################################################
-    # COMPONENTS
-    ###########################################################################
-    
-    # generate structural components and join with NSCs
-    P58_metadata = PAL.get_default_metadata('fragility_DB_FEMA_P58_2nd')
-    cmp_structural = get_structural_cmp_MF(run_data, P58_metadata)
-    cmp_marginals = pd.concat([cmp_structural, cmp_marginals], axis=0)
-    
-    # to make the convenience keywords work in the model, 
-    # we need to specify the number of stories
-    PAL.stories = 3
+def get_P58_repair(PAL):
+    return(cached('P58_repair', lambda: PAL.get_default_data(
+        'bldg_repair_DB_FEMA_P58_2nd')))
 
-    # now load the model into Pelicun
-    PAL.asset.load_cmp_model({'marginals': cmp_marginals})
-    
-    # Generate the component quantity sample
-    PAL.asset.generate_cmp_sample()
+# structural components depend only on the beam and column shapes
+def get_structural_cmp(run_data, metadata):
+    return(cached(('structural', run_data['beam'], run_data['col']),
+                  lambda: get_structural_cmp_MF(run_data, metadata)))
 
-    # get the component quantity sample - again, use the save function to convert units
-    cmp_sample = PAL.asset.save_cmp_sample()
-    
-    # review the damage model - in this example: fragility functions
-    P58_data = PAL.get_default_data('fragility_DB_FEMA_P58_2nd')
+def new_assessment(seed=985):
+    # initialize, no printing outputs, offset fixed with current components
+    PAL = Assessment({
+        "PrintLog": False, 
+        "Seed": seed,
+        "Verbose": False,
+        "DemandOffset": demand_offset,
+        "NonDirectionalMultipliers": {"ALL": nondir_multi}
+    })
+    return(PAL)
 
-    # note that we drop the last three components here (excessiveRID, irreparable, and collapse) 
-    # because they are not part of P58
-    cmp_list = cmp_marginals.index.unique().values[:-3]
+# fragility data for the excessiveRID, irreparable and collapse components and
+# the incomplete P58 components of this assessment
+def get_additional_fragility_db(P58_data, cmp_list):
 
     P58_data_for_this_assessment = P58_data.loc[cmp_list,:].sort_values('Incomplete', ascending=False)
 
@@ -308,53 +268,11 @@ def estimate_damage(raw_demands, run_data, cmp_marginals, mode='generate'):
 
     # We set the incomplete flag to 0 for the additional components
     additional_fragility_db['Incomplete'] = 0
-    
-    # load fragility data
-    PAL.damage.load_damage_model([
-        additional_fragility_db,  # This is the extra fragility data we've just created
-        'PelicunDefault/fragility_DB_FEMA_P58_2nd.csv' # and this is a table with the default P58 data    
-    ])
-    
-    ### 3.3.5 Damage Process
-    # 
-    # Damage processes are a powerful new feature in Pelicun 3. 
-    # They are used to connect damages of different components in the performance model 
-    # and they can be used to create complex cascading damage models.
-    # 
-    # The default FEMA P-58 damage process is farily simple. The process below can be interpreted as follows:
-    # * If Damage State 1 (DS1) of the collapse component is triggered (i.e., the building collapsed), 
-    # then damage for all other components should be cleared from the results. 
-    # This considers that component damages (and their consequences) in FEMA P-58 are conditioned on no collapse.
 
-    # * If Damage State 1 (DS1) of any of the excessiveRID components is triggered 
-    # (i.e., the residual drifts are larger than the prescribed capacity on at least one floor),
-    # then the irreparable component should be set to DS1.
+    return(additional_fragility_db)
 
-    # FEMA P58 uses the following process:
-    dmg_process = {
-        "1_collapse": {
-            "DS1": "ALL_NA"
-        },
-        "2_excessiveRID": {
-            "DS1": "irreparable_DS1"
-        }
-    }
-    
-    ###########################################################################
-    # DAMAGE
-    ###########################################################################
-    
-    print('Damage estimation...')
-    # Now we can run the calculation
-    PAL.damage.calculate(dmg_process=dmg_process)#, block_batch_size=100)
-    
-    # Damage estimates
-    damage_sample = PAL.damage.save_sample()
-    
-    ###########################################################################
-    # LOSS
-    ###########################################################################
-    
+# damage drivers and the consequence model each one maps to
+def get_loss_map(cmp_marginals):
     # we need to prepend 'DMG-' to the component names to tell pelicun to look for the damage of these components
     drivers = [f'DMG-{cmp}' for cmp in cmp_marginals.index.unique()]
     drivers = drivers[:-3]+drivers[-2:]
@@ -369,9 +287,10 @@ def estimate_damage(raw_demands, run_data, cmp_marginals, mode='generate'):
     # Assemble the DataFrame with the mapping information
     # The column name identifies the type of the consequence model.
     loss_map = pd.DataFrame(loss_models, columns=['BldgRepair'], index=drivers)
-    
-    # load the consequence models
-    P58_data = PAL.get_default_data('bldg_repair_DB_FEMA_P58_2nd')
+    return(loss_map)
+
+# group E consequences missing from P58 and the replacement consequences
+def get_additional_consequences():
 
     # group E
     incomplete_cmp = pd.DataFrame(
@@ -397,9 +316,6 @@ def estimate_damage(raw_demands, run_data, cmp_marginals, mode='generate'):
     incomplete_cmp.loc[('E.20.22.112a', 'Time')] = [0, '1 EA', 'worker_day',
                                                  0.02, 0.5, 'lognormal']
 
-    # get the consequences used by this assessment
-    P58_data_for_this_assessment = P58_data.loc[loss_map['BldgRepair'].values[:-5],:]
-
     # initialize the dataframe
     additional_consequences = pd.DataFrame(
         columns = pd.MultiIndex.from_tuples([('Incomplete',''), 
@@ -411,23 +327,135 @@ def estimate_damage(raw_demands, run_data, cmp_marginals, mode='generate'):
     )
     
     # add the data about replacement cost and time
-
-    # use PACT
-    # assume $250/sf
-    # assume 40% of replacement cost is labor, $680/worker-day for SF Bay Area
-    replacement_cost = 250.0*90.0*90.0*4
-    replacement_time = replacement_cost*0.4/680.0
     additional_consequences.loc[('replacement', 'Cost')] = [0, '1 EA',
                                                             'USD_2011',
                                                             replacement_cost]
     additional_consequences.loc[('replacement', 'Time')] = [0, '1 EA',
                                                             'worker_day',
                                                             replacement_time]
+    return(additional_consequences, incomplete_cmp)
+
+###########################################################################
+# DAMAGE AND LOSS FOR A DEMAND SAMPLE
+###########################################################################
+
+# demand_sample: realizations x (type, loc, dir), as from save_sample()
+# sa_tm: spectral acceleration at Tm, one value or one per realization
+def assess_demand_sample(PAL, demand_sample, sa_tm, run_data, cmp_marginals):
+
+    # get residual drift estimates 
+    PID = demand_sample['PID']
+
+    RID = PAL.demand.estimate_RID(PID, {'yield_drift': delta_y}) 
+
+    # and join them with the demand_sample
+    demand_sample_ext = pd.concat([demand_sample, RID], axis=1)
+
+    # add spectral acceleration at fundamental period (BEARING EFFECTIVE PERIOD)
+    # does Sa(T) characterize this well considering impact? for now, try using peak acceleration
+    # demand_sample_ext[('SA_Tm',0,1)] = max(run_data['accMax0'],
+    #                                        run_data['accMax1'],
+    #                                        run_data['accMax2'],
+    #                                        run_data['accMax3'])
+
+    demand_sample_ext[('SA_Tm',0,1)] = sa_tm
+    
+    demand_sample_ext[('PID_all',0,1)] = demand_sample_ext[[('PID','1','1'),
+                                                            ('PID','2','1'),
+                                                            ('PID','3','1')]].max(axis=1)
+    
+    # add units to the data 
+    demand_sample_ext.T.insert(0, 'Units',"")
+
+    # PFA and SA are in "g" in this example, while PID and RID are "rad"
+    demand_sample_ext.loc['Units', ['PFA', 'SA_Tm']] = 'g'
+    demand_sample_ext.loc['Units',['PID', 'PID_all', 'RID']] = 'rad'
+    demand_sample_ext.loc['Units',['PFV']] = 'inps'
+
+
+    PAL.demand.load_sample(demand_sample_ext)
+    
+    ###########################################################################
+    # COMPONENTS
+    ###########################################################################
+    
+    # generate structural components and join with NSCs
+    P58_metadata = get_P58_metadata(PAL)
+    cmp_structural = get_structural_cmp(run_data, P58_metadata)
+    cmp_marginals = pd.concat([cmp_structural, cmp_marginals], axis=0)
+    
+    # to make the convenience keywords work in the model, 
+    # we need to specify the number of stories
+    PAL.stories = 3
+
+    # now load the model into Pelicun
+    PAL.asset.load_cmp_model({'marginals': cmp_marginals})
+    
+    # Generate the component quantity sample
+    PAL.asset.generate_cmp_sample()
+
+    # get the component quantity sample - again, use the save function to convert units
+    cmp_sample = PAL.asset.save_cmp_sample()
+    
+    # review the damage model - in this example: fragility functions
+    P58_data = get_P58_fragility(PAL)
+
+    # note that we drop the last three components here (excessiveRID, irreparable, and collapse) 
+    # because they are not part of P58
+    cmp_list = cmp_marginals.index.unique().values[:-3]
+
+    additional_fragility_db = cached(
+        ('additional_fragility', tuple(cmp_list)),
+        lambda: get_additional_fragility_db(P58_data, cmp_list))
+    
+    # load fragility data
+    # cached tables are passed as copies so pelicun cannot change them
+    PAL.damage.load_damage_model([
+        additional_fragility_db.copy(),  # This is the extra fragility data we've just created
+        P58_data.copy() # and this is the table with the default P58 data (PelicunDefault/fragility_DB_FEMA_P58_2nd.csv)
+    ])
+    
+    ### 3.3.5 Damage Process
+    # 
+    # Damage processes are a powerful new feature in Pelicun 3. 
+    # They are used to connect damages of different components in the performance model 
+    # and they can be used to create complex cascading damage models.
+    # 
+    # The default FEMA P-58 damage process is farily simple. The process below can be interpreted as follows:
+    # * If Damage State 1 (DS1) of the collapse component is triggered (i.e., the building collapsed), 
+    # then damage for all other components should be cleared from the results. 
+    # This considers that component damages (and their consequences) in FEMA P-58 are conditioned on no collapse.
+
+    # * If Damage State 1 (DS1) of any of the excessiveRID components is triggered 
+    # (i.e., the residual drifts are larger than the prescribed capacity on at least one floor),
+    # then the irreparable component should be set to DS1.
+    
+    ###########################################################################
+    # DAMAGE
+    ###########################################################################
+    
+    print('Damage estimation...')
+    # Now we can run the calculation
+    PAL.damage.calculate(dmg_process=dmg_process)#, block_batch_size=100)
+    
+    # Damage estimates
+    damage_sample = PAL.damage.save_sample()
+    
+    ###########################################################################
+    # LOSS
+    ###########################################################################
+    
+    loss_map = get_loss_map(cmp_marginals)
+    
+    # load the consequence models
+    additional_consequences, incomplete_cmp = cached(
+        'additional_consequences', get_additional_consequences)
     
     # Load the loss model to pelicun
+    # (default data: PelicunDefault/bldg_repair_DB_FEMA_P58_2nd.csv)
     PAL.bldg_repair.load_model(
-        [additional_consequences, incomplete_cmp,
-          "PelicunDefault/bldg_repair_DB_FEMA_P58_2nd.csv"], 
+        [additional_consequences.copy(), incomplete_cmp.copy(),
+          get_P58_repair(PAL).copy()], 
         loss_map)
     
     # and run the calculations
@@ -437,8 +465,24 @@ def estimate_damage(raw_demands, run_data, cmp_marginals, mode='generate'):
     # loss estimates
     loss_sample = PAL.bldg_repair.sample
     
-    # group components and ensure that all components and replacement are present
+    # aggregate
+    agg_DF = PAL.bldg_repair.aggregate_losses()
+    
+    return(cmp_sample, damage_sample, loss_sample, agg_DF, cmp_list)
+
+# loss by component group (non-replacement realizations) and replacement
+# frequencies of a loss sample with n_sample realizations, indexed 0..n-1
+def summarize_losses(loss_sample, cmp_list, n_sample):
+    
+    # group components
     loss_by_cmp = loss_sample.groupby(level=[0, 2], axis=1).sum()['COST']
+    return(summarize_loss_by_cmp(loss_by_cmp, cmp_list, n_sample))
+
+# same, from repair cost by damaged component (realizations x components,
+# replacement cost under 'collapse' and 'irreparable')
+def summarize_loss_by_cmp(loss_by_cmp, cmp_list, n_sample):
+    
+    # ensure that all components and replacement are present
     for cmp_grp in list(cmp_list):
         if cmp_grp not in list(loss_by_cmp.columns):
             loss_by_cmp[cmp_grp] = 0
@@ -479,9 +523,250 @@ def estimate_damage(raw_demands, run_data, cmp_marginals, mode='generate'):
     # this returns NaN if collapse/irreparable is 100%
     loss_groups = loss_groups.describe()
     
-    # aggregate
-    agg_DF = PAL.bldg_repair.aggregate_losses()
+    return(loss_groups, collapse_freq, irreparable_freq)
+
+###########################################################################
+# SINGLE RUN
+###########################################################################
+
+# demand realizations of one run, loaded into PAL
+# raw_demands is not changed
+def get_demand_sample(PAL, raw_demands, n_sample, mode='generate'):
+    
+    if mode=='validation':
+        PAL.demand.load_sample(raw_demands)
+        PAL.demand.calibrate_model(
+            {
+                "ALL": {
+                    "DistributionFamily": "lognormal"
+                }
+            }
+        )
+    else:
+        # specify deterministic demands
+        demands = raw_demands.copy()
+        demands.insert(1, 'Family',"deterministic")
+        demands.rename(columns = {'Value': 'Theta_0'}, inplace=True)
+        
+        # prepare a correlation matrix that represents perfect correlation
+        ndims = demands.shape[0]
+        demand_types = demands.index 
+    
+        perfect_CORR = pd.DataFrame(
+            np.ones((ndims, ndims)),
+            columns = demand_types,
+            index = demand_types)
+    
+        # load the demand model
+        PAL.demand.load_model({'marginals': demands,
+                               'correlation': perfect_CORR})
+
+    # generate demand sample
+    PAL.demand.generate_sample({"SampleSize": n_sample})
+
+    # extract the generated sample
+    # Note that calling the save_sample() method is better than directly pulling the 
+    # sample attribute from the demand object because the save_sample method converts
+    # demand units back to the ones you specified when loading in the demands.
+    demand_sample = PAL.demand.save_sample()
+    return(demand_sample)
+
+def estimate_damage(raw_demands, run_data, cmp_marginals, mode='generate'):
+    
+    PAL = new_assessment()
+    
+    ###########################################################################
+    # DEMANDS
+    ###########################################################################
+    n_sample = 10000
+    demand_sample = get_demand_sample(PAL, raw_demands, n_sample, mode)
+
+    [cmp_sample, damage_sample, loss_sample, 
+         agg_DF, cmp_list] = assess_demand_sample(PAL, demand_sample,
+                                                  run_data['GMSTm'], run_data,
+                                                  cmp_marginals)
+    
+    loss_groups, collapse_freq, irreparable_freq = summarize_losses(
+        loss_sample, cmp_list, n_sample)
     
     return(cmp_sample, damage_sample, loss_sample, loss_groups, agg_DF,
            collapse_freq, irreparable_freq)
 
+###########################################################################
+# ADAPTIVE SAMPLE SIZE
+###########################################################################
+
+# statistics whose standard error controls the sample size
+# (agg_DF columns, and the replacement frequency)
+tracked_stats = {'cost': ('repair_cost', ''),
+                 'time_l': ('repair_time', 'parallel'),
+                 'time_u': ('repair_time', 'sequential')}
+
+# a statistic has converged when its standard error is below
+# sample_rel_tol times its mean, or below its absolute floor (so runs with
+# near-zero loss stop after the first block)
+sample_rel_tol = 0.02
+sample_abs_tol = {'cost': 0.001*replacement_cost,
+                  'time_l': 0.001*replacement_time,
+                  'time_u': 0.001*replacement_time,
+                  'replacement_freq': 0.005}
+
+# share of realizations replaced (collapse or irreparable), from the repair
+# cost by component
+def replacement_share(loss_by_cmp):
+    replaced = np.zeros(len(loss_by_cmp), dtype=bool)
+    for cmp_grp in ['collapse', 'irreparable']:
+        if cmp_grp in loss_by_cmp.columns:
+            replaced |= (loss_by_cmp[cmp_grp] > 0).values
+    return(replaced.mean())
+
+# standard errors of the mean repair cost, repair times and replacement
+# frequency; replacement_freq=None if it is exact (not sampled)
+def sample_errors(agg_DF, replacement_freq=None):
+    n_sample = len(agg_DF)
+    errors = {stat: agg_DF[col].astype(float).std()/np.sqrt(n_sample)
+              for stat, col in tracked_stats.items()}
+    if replacement_freq is None:
+        errors['replacement_freq'] = 0.0
+    else:
+        errors['replacement_freq'] = np.sqrt(
+            replacement_freq*(1 - replacement_freq)/n_sample)
+    return(errors)
+
+def sample_converged(errors, means, rel_tol=None, abs_tol=None):
+    rel_tol = sample_rel_tol if rel_tol is None else rel_tol
+    abs_tol = dict(sample_abs_tol, **(abs_tol or {}))
+    return(all(errors[stat] <= max(rel_tol*abs(means[stat]), abs_tol[stat])
+               for stat in errors))
+
+# draw_block(block, size) -> (loss_by_cmp, agg_DF) of size new realizations;
+# blocks are drawn until every tracked error is within tolerance, or
+# max_sample is reached
+# returns loss_by_cmp and agg_DF of all realizations (indexed 0..n-1),
+# n_sample and the achieved errors
+def sample_until_converged(draw_block, block_size=1000, max_sample=10000,
+                           rel_tol=None, abs_tol=None,
+                           exact_replacement=False):
+    losses = []
+    aggs = []
+    n_sample = 0
+    while n_sample < max_sample:
+        size = min(block_size, max_sample - n_sample)
+        loss_by_cmp, agg_DF = draw_block(len(aggs), size)
+        losses.append(loss_by_cmp)
+        aggs.append(agg_DF)
+        n_sample += size
+        
+        # components damaged in one block only are zero in the others
+        loss_by_cmp = pd.concat(losses, ignore_index=True).fillna(0)
+        agg_DF = pd.concat(aggs, ignore_index=True)
+        
+        replacement_freq = None if exact_replacement else replacement_share(
+            loss_by_cmp)
+        errors = sample_errors(agg_DF, replacement_freq)
+        means = {stat: agg_DF[col].astype(float).mean()
+                 for stat, col in tracked_stats.items()}
+        means['replacement_freq'] = replacement_freq or 0.0
+        if sample_converged(errors, means, rel_tol, abs_tol):
+            break
+    
+    return(loss_by_cmp, agg_DF, n_sample, errors)
+
+# estimate_damage with the sample grown in blocks of block_size (each a new
+# assessment, seeded seed + block) until the loss statistics converge
+# returns loss_groups, agg_DF, collapse_freq, irreparable_freq, the sample
+# size and the achieved standard errors (cost, time_l, time_u,
+# replacement_freq)
+def estimate_damage_adaptive(raw_demands, run_data, cmp_marginals,
+                             mode='generate', block_size=1000,
+                             max_sample=10000, rel_tol=None, abs_tol=None,
+                             seed=985):
+    
+    cmp_lists = []
+    
+    def draw_block(block, size):
+        PAL = new_assessment(seed=seed + block)
+        demand_sample = get_demand_sample(PAL, raw_demands, size, mode)
+        [cmp_sample, damage_sample, loss_sample, 
+             agg_DF, cmp_list] = assess_demand_sample(PAL, demand_sample,
+                                                      run_data['GMSTm'],
+                                                      run_data, cmp_marginals)
+        cmp_lists.append(cmp_list)
+        loss_by_cmp = loss_sample.groupby(level=[0, 2], axis=1).sum()['COST']
+        return(loss_by_cmp.reset_index(drop=True),
+               agg_DF.reset_index(drop=True))
+    
+    loss_by_cmp, agg_DF, n_sample, errors = sample_until_converged(
+        draw_block, block_size=block_size, max_sample=max_sample,
+        rel_tol=rel_tol, abs_tol=abs_tol)
+    
+    loss_groups, collapse_freq, irreparable_freq = summarize_loss_by_cmp(
+        loss_by_cmp, cmp_lists[0], n_sample)
+    
+    return(loss_groups, agg_DF, collapse_freq, irreparable_freq,
+           n_sample, errors)
+
+###########################################################################
+# BATCH OF RUNS
+###########################################################################
+
+# runs with the same structural components share one component model
+def structural_key(run_data, metadata):
+    cmp_structural = get_structural_cmp(run_data, metadata)
+    return(tuple(zip(cmp_structural.index, cmp_structural['Location'])))
+
+# deterministic ('generate') demands of many runs through one assessment
+# all_demands: EDP x ['Units', run indices as str], as read in loss_database
+# run_df: run data, one row per run (full_isolation_data)
+# every run gets n_sample identical demand realizations; runs with the same
+# structural components are stacked, runs_per_batch at a time, through one
+# damage and loss calculation, then split back into runs
+# returns {run index: (loss_groups, agg_DF, collapse_freq, irreparable_freq)}
+# in the order of run_df; the random stream is shared within a batch, so
+# values differ from estimate_damage by sampling noise only
+def estimate_damage_batch(all_demands, run_df, cmp_marginals,
+                          n_sample=10000, runs_per_batch=10):
+    
+    edp = convert_to_MultiIndex(all_demands, axis=0)
+    edp.index.names = ['type','loc','dir']
+    
+    # group runs by structural components
+    P58_metadata = get_P58_metadata(new_assessment())
+    groups = {}
+    for run_idx in run_df.index:
+        key = structural_key(run_df.loc[run_idx], P58_metadata)
+        groups.setdefault(key, []).append(run_idx)
+    
+    results = {}
+    for group in groups.values():
+        for start in range(0, len(group), runs_per_batch):
+            batch = group[start:start+runs_per_batch]
+            
+            print('========================================')
+            print('Estimating loss for run indices', batch)
+            
+            # runs stacked in blocks of n_sample identical rows
+            run_edp = edp[[str(run_idx) for run_idx in batch]].astype(float)
+            demand_sample = pd.DataFrame(
+                np.repeat(run_edp.values.T, n_sample, axis=0),
+                columns=run_edp.index)
+            sa_tm = np.repeat(run_df.loc[batch, 'GMSTm'].values, n_sample)
+            
+            PAL = new_assessment()
+            [cmp_sample, damage_sample, loss_sample, 
+                 agg_DF, cmp_list] = assess_demand_sample(PAL, demand_sample,
+                                                          sa_tm,
+                                                          run_df.loc[batch[0]],
+                                                          cmp_marginals)
+            
+            # split realizations back into runs
+            for k, run_idx in enumerate(batch):
+                rows = slice(k*n_sample, (k+1)*n_sample)
+                run_loss = loss_sample.iloc[rows].reset_index(drop=True)
+                run_agg = agg_DF.iloc[rows].reset_index(drop=True)
+                loss_groups, collapse_freq, irreparable_freq = summarize_losses(
+                    run_loss, cmp_list, n_sample)
+                results[run_idx] = (loss_groups, run_agg,
+                                    collapse_freq, irreparable_freq)
+    
+    return({run_idx: results[run_idx] for run_idx in run_df.index})
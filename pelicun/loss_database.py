@@ -13,13 +13,17 @@
 
 ############################################################################
 
+import os
+from functools import partial
+
 import pandas as pd
 idx = pd.IndexSlice
 pd.options.display.max_rows = 30
 
 # and import pelicun classes and methods
 from pelicun.base import convert_to_MultiIndex
-from estimate_loss import estimate_damage
+from loss_driver import (run_losses, run_loss, run_loss_batch, group_table,
+                         structural_group, input_hash)
 
 import warnings
 warnings.filterwarnings('ignore')
@@ -70,108 +74,70 @@ all_demands = all_demands.set_index('EDP', drop=True)
 
 #%% estimate loss for set
 
-all_losses = []
-loss_cmp_group = []
-col_list = []
-irr_list = []
-
-# for run_idx in range(3):
-for run_idx in full_isolation_data.index:
-    run_data = full_isolation_data.loc[run_idx]
+# loss_method:
+# 'sample': one pelicun assessment of 10,000 realizations per run
+# 'batch' (opt-in): fragility/consequence models are loaded once per batch
+# and all runs of a batch go through damage and loss as one stacked sample.
+# The runs share one random stream, so their realizations differ from
+# 'sample' (same distribution, different draws), and a batch holds
+# runs_per_task x 10,000 rows of every damage and loss table in memory
+# deterministic_loss.py (damage state probabilities from the fragility CDFs)
+# is not an option here until compare_deterministic_loss.py has been run
+# against pelicun on this database and its agreement recorded
+loss_method = 'sample'
+
+# the sample size is fixed (adaptive_sampling = False), as in loss_validation
+# and loss_baseline. With adaptive_sampling = True, 'sample' grows the sample
+# in blocks until the standard errors of mean repair cost, repair times and
+# replacement frequency are within tolerance
+# (estimate_loss.sample_until_converged), up to max_sample
+adaptive_sampling = False
+max_sample = 10000
+
+# runs (or batches of runs) are spread over worker processes; each run's
+# summary is saved to results_file as it finishes, with a hash of its
+# demands, run data, components and loss settings. resume = True skips runs
+# stored under the same hash and estimates changed runs again
+n_workers = os.cpu_count()
+resume = False
+results_file = './results/loss_checkpoint.db'
+
+def make_task(run_ids):
+    if loss_method == 'batch':
+        return(partial(run_loss_batch,
+                       all_demands[['Units', *map(str, run_ids)]],
+                       full_isolation_data.loc[run_ids], cmp_marginals,
+                       runs_per_batch=len(run_ids)))
     
+    run_idx = run_ids[0]
     raw_demands = all_demands[['Units', str(run_idx)]]
     raw_demands.columns = ['Units', 'Value']
     raw_demands = convert_to_MultiIndex(raw_demands, axis=0)
     raw_demands.index.names = ['type','loc','dir']
-    
-    print('========================================')
-    print('Estimating loss for run index', run_idx)
-    
-    [cmp, dmg, loss, loss_cmp, agg, 
-         collapse_rate, irr_rate] = estimate_damage(raw_demands,
-                                                run_data,
-                                                cmp_marginals)
-    loss_summary = agg.describe([0.1, 0.5, 0.9])
-    cost = loss_summary['repair_cost']['mean']
-    time_l = loss_summary[('repair_time', 'parallel')]['mean']
-    time_u = loss_summary[('repair_time', 'sequential')]['mean']
-    
-    print('Mean repair cost: ', f'${cost:,.2f}')
-    print('Mean lower bound repair time: ', f'{time_l:,.2f}', 'worker-days')
-    print('Mean upper bound repair time: ', f'{time_u:,.2f}', 'worker-days')
-    print('Collapse frequency: ', f'{collapse_rate:.2%}')
-    print('Irreparable RID frequency: ', f'{irr_rate:.2%}')
-    print('Replacement frequency: ', f'{collapse_rate+irr_rate:.2%}')
-    all_losses.append(loss_summary)
-    loss_cmp_group.append(loss_cmp)
-    col_list.append(collapse_rate)
-    irr_list.append(irr_rate)
-    
+    return(partial(run_loss, run_idx, raw_demands,
+                   full_isolation_data.loc[run_idx], cmp_marginals,
+                   adaptive=adaptive_sampling,
+                   max_sample=max_sample))
+
+def run_hash(run_idx):
+    return(input_hash(all_demands[['Units', str(run_idx)]],
+                      full_isolation_data.loc[run_idx], cmp_marginals,
+                      loss_method, adaptive_sampling, max_sample))
+
+if loss_method == 'batch':
+    # runs with the same structural components share one batch
+    loss_df_data = run_losses(full_isolation_data.index.tolist(), make_task,
+                              run_hash, results_file, 'loss_data', n_workers=n_workers,
+                              resume=resume, runs_per_task=10,
+                              group_key=structural_group(full_isolation_data))
+else:
+    loss_df_data = run_losses(full_isolation_data.index.tolist(), make_task,
+                              run_hash, results_file, 'loss_data', n_workers=n_workers,
+                              resume=resume)
+
+# one row per run: repair cost and times, replacement frequencies, loss by
+# component group, then sample size and standard errors
 loss_file = './results/loss_estimate_data.csv'
+loss_df_data.to_csv(loss_file, index=False)
 by_cmp_file = './results/loss_estimate_by_groups.csv'
-pd.concat(all_losses).to_csv(loss_file)
-pd.concat(loss_cmp_group).to_csv(by_cmp_file)
-
-#%% flatten data
-
-loss_df = pd.read_csv(loss_file, header=[0,1])
-
-loss_header = ['cost_mean', 'cost_std', 'cost_min',
-               'cost_10%', 'cost_50%', 'cost_90%', 'cost_max',
-               'time_l_mean', 'time_l_std', 'time_l_min',
-               'time_l_10%', 'time_l_50%', 'time_l_90%', 'time_l_max',
-               'time_u_mean', 'time_u_std', 'time_u_min',
-               'time_u_10%', 'time_u_50%', 'time_u_90%', 'time_u_max']
-
-all_rows = []
-
-for row_idx in range(len(loss_df)):
-    if row_idx % 8 == 0:
-        # get the block with current run, drop the 'Count'
-        run_df = loss_df[row_idx:row_idx+8]
-        run_df = run_df.transpose()
-        run_df.columns = run_df.iloc[0]
-        run_df = run_df.drop(run_df.index[0])
-        new_row = pd.concat([run_df.iloc[0], run_df.iloc[1], run_df.iloc[2]])
-        new_row = new_row.drop(new_row.index[0])
-        
-        all_rows.append(new_row)
-        
-loss_df_data = pd.concat(all_rows, axis=1).T
-loss_df_data.columns = loss_header
-
-loss_df_data['collapse_freq'] = col_list
-loss_df_data['irreparable_freq'] = irr_list
-loss_df_data['replacement_freq'] = [x + y for x, y in zip(col_list, irr_list)]
-
-# loss_df_data.to_csv(loss_file, index=False)
-#%%
-group_df = pd.read_csv(by_cmp_file, header=0)
-group_header = ['B_mean', 'B_std', 'B_min',
-               'B_25%', 'B_50%', 'B_75%', 'B_max',
-               'C_mean', 'C_std', 'C_min',
-               'C_25%', 'C_50%', 'C_75%', 'C_max',
-               'D_mean', 'D_std', 'D_min',
-               'D_25%', 'D_50%', 'D_75%', 'D_max',
-               'E_mean', 'E_std', 'E_min',
-               'E_25%', 'E_50%', 'E_75%', 'E_max']
-
-all_rows = []
-
-for row_idx in range(len(group_df)):
-    if row_idx % 8 == 0:
-        # get the block with current run, drop the 'Count'
-        run_df = group_df[row_idx:row_idx+8]
-        run_df = run_df.transpose()
-        run_df.columns = run_df.iloc[0]
-        run_df = run_df.drop(run_df.index[0])
-        new_row = pd.concat([run_df.iloc[0], run_df.iloc[1], run_df.iloc[2], run_df.iloc[3]])
-        new_row = new_row.drop(new_row.index[0])
-        
-        all_rows.append(new_row)
-        
-group_df_data = pd.concat(all_rows, axis=1).T
-group_df_data.columns = group_header
-
-all_data = pd.concat([loss_df_data, group_df_data], axis=1)
-all_data.to_csv(loss_file, index=False)
\ No newline at end of file
+group_table(loss_df_data).to_csv(by_cmp_file)
@@ -0,0 +1,274 @@
+############################################################################
+#               Parallel loss driver
+
+# Created by:   Huy Pham
+#               University of California, Berkeley
+
+# Date created: October 2026
+
+# Description:  Shared driver of loss_database, loss_validation and
+# loss_baseline. Runs (or IDA levels) are spread over forked worker
+# processes. The P58 tables are loaded into estimate_loss.db_cache before
+# the fork, so every worker starts with a warm pelicun setup and keeps it
+# for all of its runs. The flattened loss summary of each run is committed
+# to a results store (resultsStore.py) as soon as it comes back, with a hash
+# of the run's inputs. With resume, runs stored under the same hash are
+# skipped and runs whose inputs changed are estimated again, so a crash
+# loses at most the runs in progress
+
+# Open issues:  (1) workers are forked; spawn would rerun the calling script
+#               (2) the hash covers what the calling script passes to
+#               input_hash; the P58 tables themselves are not hashed
+
+############################################################################
+
+import os, os.path
+import hashlib
+import multiprocessing as mp
+import pandas as pd
+
+from estimate_loss import (new_assessment, get_P58_metadata,
+                           get_P58_fragility, get_P58_repair, cached,
+                           get_additional_consequences, structural_key,
+                           estimate_damage, estimate_damage_adaptive,
+                           estimate_damage_batch, sample_errors)
+
+import sys
+sys.path.append('..')
+from resultsStore import ResultsStore
+
+###########################################################################
+# LOSS SUMMARY OF ONE RUN
+###########################################################################
+
+# statistics kept from agg_DF.describe([0.1, 0.5, 0.9]) and
+# loss_groups.describe(), as in the flattened loss_estimate files
+agg_columns = {'cost': ('repair_cost', ''),
+               'time_l': ('repair_time', 'parallel'),
+               'time_u': ('repair_time', 'sequential')}
+agg_stats = ['mean', 'std', 'min', '10%', '50%', '90%', 'max']
+group_stats = ['mean', 'std', 'min', '25%', '50%', '75%', 'max']
+
+# one flat row: repair cost and times, replacement frequencies, loss by
+# component group (the columns of the flattened loss_estimate files), then
+# sample size and standard errors
+def summary_record(agg_DF, loss_groups, collapse_freq, irreparable_freq,
+                   errors=None):
+
+    if errors is None:
+        errors = sample_errors(agg_DF, collapse_freq + irreparable_freq)
+
+    record = {}
+    loss_summary = agg_DF.describe([0.1, 0.5, 0.9])
+    for name, col in agg_columns.items():
+        for stat in agg_stats:
+            record[name+'_'+stat] = float(loss_summary.loc[stat, col])
+
+    record['collapse_freq'] = float(collapse_freq)
+    record['irreparable_freq'] = float(irreparable_freq)
+    record['replacement_freq'] = float(collapse_freq + irreparable_freq)
+
+    # NaN if every realization is replaced
+    group_summary = loss_groups.reindex(group_stats)
+    for grp in ['B', 'C', 'D', 'E']:
+        for stat in group_stats:
+            record[grp+'_'+stat] = float(group_summary.loc[stat, grp])
+
+    record['n_sample'] = len(agg_DF)
+    for stat in ['cost', 'time_l', 'time_u', 'replacement_freq']:
+        record[stat+'_se'] = float(errors[stat])
+
+    return(record)
+
+# loss_groups.describe() of each row of run_losses, stacked as in the
+# loss_estimate_by_groups files; count is the number of realizations not
+# replaced
+def group_table(loss_df):
+    tables = []
+    for run_id, record in loss_df.iterrows():
+        table = pd.DataFrame({grp: [record[grp+'_'+stat] for stat in group_stats]
+                              for grp in ['B', 'C', 'D', 'E']},
+                             index=group_stats)
+        count = round(record['n_sample']*(1 - record['replacement_freq']))
+        table.loc['count'] = float(count)
+        tables.append(table.reindex(['count'] + group_stats))
+    return(pd.concat(tables))
+
+# raw_demands: as for estimate_damage (one run's EDP, or the EDP of many
+# runs in 'validation' mode)
+# adaptive: grow the sample until it converges
+# agg_file: also save the repair cost and time realizations there
+# returns {run_id: record}
+def run_loss(run_id, raw_demands, run_data, cmp_marginals, mode='generate',
+             adaptive=True, max_sample=10000, agg_file=None):
+
+    errors = None
+    if adaptive:
+        [loss_cmp, agg, collapse_rate, irr_rate,
+             n_sample, errors] = estimate_damage_adaptive(raw_demands,
+                                                          run_data,
+                                                          cmp_marginals,
+                                                          mode=mode,
+                                                          max_sample=max_sample)
+    else:
+        [cmp, dmg, loss, loss_cmp, agg,
+             collapse_rate, irr_rate] = estimate_damage(raw_demands,
+                                                        run_data,
+                                                        cmp_marginals,
+                                                        mode=mode)
+
+    if agg_file is not None:
+        agg.to_csv(agg_file, index=False)
+
+    return({run_id: summary_record(agg, loss_cmp, collapse_rate, irr_rate,
+                                   errors)})
+
+# runs stacked through estimate_damage_batch (all_demands: EDP x
+# ['Units', run indices as str], run_df: their run data)
+# returns {run_id: record}
+def run_loss_batch(all_demands, run_df, cmp_marginals, n_sample=10000,
+                   runs_per_batch=10):
+
+    batch_results = estimate_damage_batch(all_demands, run_df, cmp_marginals,
+                                          n_sample=n_sample,
+                                          runs_per_batch=runs_per_batch)
+    return({run_idx: summary_record(agg, loss_cmp, collapse_rate, irr_rate)
+             for run_idx, (loss_cmp, agg, collapse_rate, irr_rate)
+             in batch_results.items()})
+
+###########################################################################
+# WORKERS
+###########################################################################
+
+# hex digest of a run's inputs: DataFrames and Series by their csv, anything
+# else (method, sample settings) by its repr
+def input_hash(*inputs):
+    digest = hashlib.sha1()
+    for item in inputs:
+        if isinstance(item, (pd.DataFrame, pd.Series)):
+            item = item.to_csv()
+        digest.update(repr(item).encode())
+    return(digest.hexdigest())
+
+# P58 tables and the replacement consequences, loaded before the fork
+def warm_cache():
+    PAL = new_assessment()
+    get_P58_metadata(PAL)
+    get_P58_fragility(PAL)
+    get_P58_repair(PAL)
+    cached('additional_consequences', get_additional_consequences)
+
+# runs with the same structural components, for batched tasks
+def structural_group(run_df):
+    metadata = get_P58_metadata(new_assessment())
+    return(lambda run_id: structural_key(run_df.loc[run_id], metadata))
+
+# task: callable returning {run_id: record}, e.g. a functools.partial of
+# run_loss or run_loss_batch
+def perform_task(estimate):
+    return(estimate())
+
+def print_summary(label, run_id, record):
+    print('========================================')
+    print('Loss for', label, run_id)
+    print('Mean repair cost: ', f"${record['cost_mean']:,.2f}")
+    print('Mean lower bound repair time: ', f"{record['time_l_mean']:,.2f}",
+          'worker-days')
+    print('Mean upper bound repair time: ', f"{record['time_u_mean']:,.2f}",
+          'worker-days')
+    print('Collapse frequency: ', f"{record['collapse_freq']:.2%}")
+    print('Irreparable RID frequency: ', f"{record['irreparable_freq']:.2%}")
+    print('Replacement frequency: ', f"{record['replacement_freq']:.2%}")
+    print('Realizations: ', record['n_sample'],
+          ', standard error of mean cost: ', f"${record['cost_se']:,.2f}")
+
+###########################################################################
+# DRIVER
+###########################################################################
+
+# run_ids: integer ids of every run, in output order
+# make_task(ids): callable for those runs, returning {run_id: record}
+# run_hash(run_id): input_hash of everything the run's summary depends on,
+# stored with the summary
+# runs_per_task: ids handed to one make_task call, taken from the same
+# group_key(run_id) group
+# resume: skip runs stored under the same hash (otherwise the table is
+# cleared)
+# returns the summaries of run_ids, in that order
+def run_losses(run_ids, make_task, run_hash, results_file, table,
+               n_workers=None, resume=False, runs_per_task=1, group_key=None,
+               label='run index'):
+
+    if n_workers is None:
+        n_workers = os.cpu_count()
+
+    hashes = {run_id: run_hash(run_id) for run_id in run_ids}
+
+    store = ResultsStore(results_file, table)
+    done = set()
+    changed = []
+    if resume:
+        statuses = store.runStatuses()
+        finished = set(statuses.loc[statuses['status'] == 'finished', 'runId'])
+        stored = store.read(newestFirst=False, withRunId=True)
+        stored_hashes = {}
+        if 'input_hash' in stored.columns:
+            stored_hashes = dict(zip(stored['runId'], stored['input_hash']))
+        for run_id in run_ids:
+            if run_id not in finished:
+                continue
+            if stored_hashes.get(run_id) == hashes[run_id]:
+                done.add(run_id)
+            else:
+                changed.append(run_id)
+        # stale summaries are replaced, not duplicated
+        store.dropRuns(changed)
+    else:
+        store.clear()
+
+    pending = [run_id for run_id in run_ids if run_id not in done]
+    print('Loss summaries stored: ' + str(len(done)) +
+          ', to estimate: ' + str(len(pending)) +
+          ' (' + str(len(changed)) + ' with changed inputs).')
+
+    warm_cache()
+
+    groups = {}
+    for run_id in pending:
+        key = None if group_key is None else group_key(run_id)
+        groups.setdefault(key, []).append(run_id)
+    tasks = [make_task(group[start:start+runs_per_task])
+             for group in groups.values()
+             for start in range(0, len(group), runs_per_task)]
+
+    if (n_workers <= 1) or (len(tasks) <= 1):
+        pool = None
+        results = map(perform_task, tasks)
+    else:
+        # fork so workers keep the warm cache and do not re-import the
+        # calling script
+        if 'fork' in mp.get_all_start_methods():
+            mp_context = mp.get_context('fork')
+        else:
+            mp_context = mp.get_context()
+        pool = mp_context.Pool(min(n_workers, len(tasks)))
+        results = pool.imap_unordered(perform_task, tasks)
+
+    try:
+        for records in results:
+            # saved as they come
+            for run_id, record in records.items():
+                store.append({**record, 'input_hash': hashes[run_id]},
+                             runId=run_id)
+                print_summary(label, run_id, record)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    summaries = store.read(newestFirst=False, withRunId=True)
+    store.close()
+    if summaries.empty:
+        return(summaries)
+    summaries = summaries.set_index('runId').loc[list(run_ids)]
+    return(summaries.drop(columns=['input_hash']).reset_index(drop=True))
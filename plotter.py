@@ -7,11 +7,12 @@
 # Date created: May 2020
 
 # Description:  Plotter utility used to plot csv files in /outputs/
+#               or a run kept in the run archive
 
 ############################################################################
 
-import pandas as pd
 import matplotlib.pyplot as plt
+from runArchive import csvReader, RunArchive
 
 plt.close('all')
 
@@ -19,43 +20,53 @@ dispColumns = ['time', 'isol1', 'isol2', 'isol3', 'isol4', 'isolLC']
 
 dataDir = './outputs/'
 
-isolDisp = pd.read_csv(dataDir+'isolDisp.csv', sep=' ', header=None, names=dispColumns)
-isolVert = pd.read_csv(dataDir+'isolVert.csv', sep=' ', header=None, names=dispColumns)
-isolRot  = pd.read_csv(dataDir+'isolRot.csv', sep=' ', header=None, names=dispColumns)
+# histories from the csv recorders, or from an archived run
+# (archiveDir as given to runDatabase, archiveRun: the run's LHS index)
+archiveDir = None
+archiveRun = 0
 
-story1Disp = pd.read_csv(dataDir+'story1Disp.csv', sep=' ', header=None, names=dispColumns)
-story2Disp = pd.read_csv(dataDir+'story2Disp.csv', sep=' ', header=None, names=dispColumns)
-story3Disp = pd.read_csv(dataDir+'story3Disp.csv', sep=' ', header=None, names=dispColumns)
+if archiveDir is None:
+    readChannel = csvReader(dataDir)
+else:
+    readChannel = RunArchive(archiveDir).reader(archiveRun)
 
-story0Acc = pd.read_csv(dataDir+'story0Acc.csv', sep=' ', header=None, names=dispColumns)
-story1Acc = pd.read_csv(dataDir+'story1Acc.csv', sep=' ', header=None, names=dispColumns)
-story2Acc = pd.read_csv(dataDir+'story2Acc.csv', sep=' ', header=None, names=dispColumns)
-story3Acc = pd.read_csv(dataDir+'story3Acc.csv', sep=' ', header=None, names=dispColumns)
+isolDisp = readChannel('isolDisp', dispColumns)
+isolVert = readChannel('isolVert', dispColumns)
+isolRot  = readChannel('isolRot', dispColumns)
+
+story1Disp = readChannel('story1Disp', dispColumns)
+story2Disp = readChannel('story2Disp', dispColumns)
+story3Disp = readChannel('story3Disp', dispColumns)
+
+story0Acc = readChannel('story0Acc', dispColumns)
+story1Acc = readChannel('story1Acc', dispColumns)
+story2Acc = readChannel('story2Acc', dispColumns)
+story3Acc = readChannel('story3Acc', dispColumns)
 
 # forceColumns = ['time', 'iFx', 'iFy', 'iFz', 'iMx', 'iMy', 'iMz', 'jFx', 'jFy', 'jFz', 'jMx', 'jMy', 'jMz']
 forceColumns = ['time', 'iFx', 'iFy', 'iFz', 'iMx', 'iMy', 'iMz', 'jFx', 'jFy', 'jFz', 'jMx', 'jMy', 'jMz']
 
-isol1Force = pd.read_csv(dataDir+'isol1Force.csv', sep = ' ', header=None, names=forceColumns)
-isol2Force = pd.read_csv(dataDir+'isol2Force.csv', sep = ' ', header=None, names=forceColumns)
-isol3Force = pd.read_csv(dataDir+'isol3Force.csv', sep = ' ', header=None, names=forceColumns)
-isol4Force = pd.read_csv(dataDir+'isol4Force.csv', sep = ' ', header=None, names=forceColumns)
-isolLCForce = pd.read_csv(dataDir+'isolLCForce.csv', sep = ' ', header=None, names=forceColumns)
+isol1Force = readChannel('isol1Force', forceColumns)
+isol2Force = readChannel('isol2Force', forceColumns)
+isol3Force = readChannel('isol3Force', forceColumns)
+isol4Force = readChannel('isol4Force', forceColumns)
+isolLCForce = readChannel('isolLCForce', forceColumns)
 
-col1Force = pd.read_csv(dataDir+'colForce1.csv', sep = ' ', header=None, names=forceColumns)
-col2Force = pd.read_csv(dataDir+'colForce2.csv', sep = ' ', header=None, names=forceColumns)
-col3Force = pd.read_csv(dataDir+'colForce3.csv', sep = ' ', header=None, names=forceColumns)
-col4Force = pd.read_csv(dataDir+'colForce4.csv', sep = ' ', header=None, names=forceColumns)
+col1Force = readChannel('colForce1', forceColumns)
+col2Force = readChannel('colForce2', forceColumns)
+col3Force = readChannel('colForce3', forceColumns)
+col4Force = readChannel('colForce4', forceColumns)
 
-outercolForce = pd.read_csv(dataDir+'colForce1.csv', sep=' ', header=None, names=forceColumns)
-innercolForce = pd.read_csv(dataDir+'colForce2.csv', sep=' ', header=None, names=forceColumns)
+outercolForce = readChannel('colForce1', forceColumns)
+innercolForce = readChannel('colForce2', forceColumns)
 
-diaphragmForce1 = pd.read_csv(dataDir+'diaphragmForce1.csv', sep = ' ', header=None, names=forceColumns)
-diaphragmForce2 = pd.read_csv(dataDir+'diaphragmForce2.csv', sep = ' ', header=None, names=forceColumns)
-diaphragmForce3 = pd.read_csv(dataDir+'diaphragmForce3.csv', sep = ' ', header=None, names=forceColumns)
+diaphragmForce1 = readChannel('diaphragmForce1', forceColumns)
+diaphragmForce2 = readChannel('diaphragmForce2', forceColumns)
+diaphragmForce3 = readChannel('diaphragmForce3', forceColumns)
 
 # impactColumns = ['time', 'iFx', 'iShear', 'iMoment', 'jFx', 'jShear', 'jMoment']
-# impactForce1 = pd.read_csv(dataDir+'wallImpactForce1.csv', sep = ' ', header=None, names=impactColumns)
-# impactForce2 = pd.read_csv(dataDir+'wallImpactForce2.csv', sep = ' ', header=None, names=impactColumns)
+# impactForce1 = readChannel('wallImpactForce1', impactColumns)
+# impactForce2 = readChannel('wallImpactForce2', impactColumns)
 
 
 force1Normalize = -isol1Force['iFy']/isol1Force['iFx']
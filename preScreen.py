@@ -0,0 +1,61 @@
+############################################################################
+#               Feasibility pre-screen
+
+# Created by:   Huy Pham
+#               University of California, Berkeley
+
+# Date created: October 2026
+
+# Description:  Drops LHS samples that cannot produce a run, before any
+#               OpenSees work. Rules are applied in the order the run loop
+#               would hit them:
+#               (1) gmScale: assigned GM scale factor >= 20
+#               (2) bearing: TFP solver returns negative/complex friction
+#               (3) scwb: no shape satisfies the superstructure checks
+#               Reports how many samples each rule rejected
+
+# Open issues:  (1) infeasible samples are dropped, not resampled, so the
+#                   remaining rows and GM draws match the unscreened loop
+
+############################################################################
+
+import numpy as np
+
+import superStructDesign as sd
+
+def screenInputs(inputVariables, inputValues, gmAssignment, maxScale=20.0):
+
+    # gmAssignment from parallelRun.assignGMs, indexed by LHS row
+    report      = {'gmScale': 0, 'bearing': 0, 'scwb': 0}
+    keep        = np.ones(len(gmAssignment), dtype=bool)
+    rows        = np.asarray(inputValues)[gmAssignment.index]
+
+    # (1) excessive GM scaling, no design needed
+    badScale    = (gmAssignment['defFactor'] >= maxScale).to_numpy()
+    report['gmScale'] = int(badScale.sum())
+    keep        &= ~badScale
+
+    # (2) bearing solver, all rows at once
+    bearing     = sd.design_batch(rows, paramNames=inputVariables)
+    badBearing  = keep & ~bearing['feasible'].to_numpy()
+    report['bearing'] = int(badBearing.sum())
+    keep        &= ~badBearing
+
+    # (3) shape selection needs the scalar design; results stay cached
+    # for the runs themselves
+    for i in np.flatnonzero(keep):
+        param   = dict(zip(inputVariables, rows[i]))
+        try:
+            sd.design(param)
+        except IndexError:
+            report['scwb'] += 1
+            keep[i] = False
+
+    report['kept'] = int(keep.sum())
+
+    print('Pre-screen rejected ' + str(report['gmScale']) + ' (GM scale), ' +
+          str(report['bearing']) + ' (bearing), ' + str(report['scwb']) +
+          ' (SCWB); ' + str(report['kept']) + ' of ' +
+          str(len(gmAssignment)) + ' samples kept.')
+
+    return(gmAssignment[keep], report)
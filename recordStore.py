@@ -0,0 +1,73 @@
+############################################################################
+#               Ground motion record store
+
+# Created by:   Huy Pham
+#               University of California, Berkeley
+
+# Date created: October 2026
+
+# Description:  Parses each PEER .AT2 record once into a float array and
+#               keeps it as .npy next to a small cache folder
+#               Array layout: [dt, npts, acc_0, acc_1, ..., acc_npts-1] (g)
+#               Records are held in memory once loaded, so runGM can feed
+#               OpenSees directly without rewriting .g3 text files
+
+# Open issues:  (1) cache is not invalidated if an .AT2 file is replaced
+
+############################################################################
+
+import os, os.path
+import tempfile
+import numpy as np
+
+from ReadRecord import ReadRecordValues
+
+class RecordStore:
+
+    def __init__(self, gmDir, cacheDir=None):
+        self.gmDir = gmDir
+        if cacheDir is None:
+            cacheDir = os.path.join(gmDir, 'npyCache')
+        self.cacheDir = cacheDir
+        self.records = dict()
+
+    def cacheFile(self, gmFile):
+        return(os.path.join(self.cacheDir, gmFile + '.npy'))
+
+    # parse the text record and write the binary copy
+    # written to a temp file then renamed, so parallel workers never
+    # see a partial file
+    def parse(self, gmFile):
+        dt, npts, values = ReadRecordValues(os.path.join(self.gmDir,
+                                                         gmFile + '.AT2'))
+        packed = np.concatenate([[dt, len(values)],
+                                 np.asarray(values, dtype=np.float64)])
+
+        os.makedirs(self.cacheDir, exist_ok=True)
+        fd, tmpName = tempfile.mkstemp(suffix='.npy', dir=self.cacheDir)
+        with os.fdopen(fd, 'wb') as tmpFile:
+            np.save(tmpFile, packed)
+        os.replace(tmpName, self.cacheFile(gmFile))
+        return(packed)
+
+    # returns (dt, npts, accel) for a record name without extension
+    def getRecord(self, gmFile):
+        if gmFile not in self.records:
+            if os.path.isfile(self.cacheFile(gmFile)):
+                packed = np.load(self.cacheFile(gmFile), mmap_mode='r')
+            else:
+                packed = self.parse(gmFile)
+            self.records[gmFile] = packed
+
+        packed = self.records[gmFile]
+        dt      = float(packed[0])
+        npts    = int(packed[1])
+        return(dt, npts, packed[2:])
+
+# one store per record folder, per process
+stores = dict()
+
+def getStore(gmDir):
+    if gmDir not in stores:
+        stores[gmDir] = RecordStore(gmDir)
+    return(stores[gmDir])
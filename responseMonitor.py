@@ -0,0 +1,179 @@
+############################################################################
+#               Response monitor
+
+# Created by:   Huy Pham
+#               University of California, Berkeley
+
+# Date created: October 2026
+
+# Description:  Step-wise checks on the live OpenSees model during runGM
+#               StopMonitor stops the dynamic analysis early when
+#               (1) collapse: peak interstory drift passes collapseDrift
+#               (2) decayed: after the record ends, floor velocities stay
+#                   below tailTol for tailWindow seconds
+#               EnvelopeRecorder keeps the maxima, residuals, first
+#               exceedance times and impact/uplift peaks postprocessing
+#               needs, in memory instead of CSV recorders
+#               Nodes and elements polled come from a FrameGeometry
+#               (demandExtraction.py), any story and bay count
+
+# Open issues:  (1) uniform story height, as FrameGeometry
+
+############################################################################
+
+import numpy as np
+import openseespy.opensees as ops
+from demandExtraction import FrameGeometry
+
+# nodes of the monitored column lines, isolation level to roof
+# lines: column lines used for story demands (outer, inner by symmetry, as
+# postprocessing.historyResults)
+def storyNodes(geometry, lines=(0, 1)):
+    return([[geometry.floorNodes(floor)[line] for line in lines]
+            for floor in range(geometry.nFloor)])
+
+class StopMonitor:
+
+    # recordEnd: duration of the ground motion record (s)
+    # collapseDrift or tailTol set to None disables that check
+    def __init__(self, recordEnd, collapseDrift=0.20, tailTol=0.01,
+                 tailWindow=2.0, geometry=None, lines=(0, 1)):
+        if geometry is None:
+            geometry        = FrameGeometry()
+        self.recordEnd      = recordEnd
+        self.collapseDrift  = collapseDrift
+        self.tailTol        = tailTol
+        self.tailWindow     = tailWindow
+        self.storyHeight    = geometry.storyHeight
+        self.storyNodes     = storyNodes(geometry, lines)
+        self.quietTime      = 0.0
+        self.lastTime       = 0.0
+
+    def peakDrift(self):
+        disp = [[ops.nodeDisp(node, 1) for node in floor]
+                for floor in self.storyNodes]
+        return(max(abs(disp[i+1][j] - disp[i][j])/self.storyHeight
+                   for i in range(len(disp)-1) for j in range(len(disp[i]))))
+
+    def peakVel(self):
+        return(max(abs(ops.nodeVel(node, 1))
+                   for floor in self.storyNodes for node in floor))
+
+    # call after each converged step; returns the stop reason or None
+    def check(self):
+        controlTime     = ops.getTime()
+        dtStep          = controlTime - self.lastTime
+        self.lastTime   = controlTime
+
+        if (self.collapseDrift is not None) and (self.peakDrift() > self.collapseDrift):
+            return('collapse')
+
+        if (self.tailTol is not None) and (controlTime > self.recordEnd):
+            if self.peakVel() < self.tailTol:
+                self.quietTime += dtStep
+            else:
+                self.quietTime = 0.0
+            if self.quietTime >= self.tailWindow:
+                return('decayed')
+
+        return(None)
+
+class EnvelopeRecorder:
+
+    # gmAccel, dt, gmFactor: the record as applied to the model, used to
+    # form absolute floor accelerations (as the '-timeSeries' recorders)
+    # geometry, lines: frame and column lines polled (see storyNodes)
+    # okDrift: drift level at which the failed-run state is sampled
+    # exceedLimits: drift limits whose first exceedance time is kept
+    def __init__(self, gmAccel, dt, gmFactor, geometry=None, lines=(0, 1),
+                 okDrift=0.20, exceedLimits=(0.05, 0.025, 0.007)):
+        if geometry is None:
+            geometry        = FrameGeometry()
+        g                   = 386.4
+        self.g              = g
+        self.gmAccel        = np.asarray(gmAccel)
+        self.gmTime         = np.arange(len(self.gmAccel))*dt
+        self.gmFactor       = gmFactor
+        self.storyHeight    = geometry.storyHeight
+        self.okDrift        = okDrift
+        self.exceedLimits   = exceedLimits
+
+        # every column line isolator; impact springs at the moat walls
+        self.storyNodes     = storyNodes(geometry, lines)
+        self.isolNodes      = geometry.floorNodes(0)[:geometry.nLine]
+        self.isolEles       = geometry.isolatorElements()[:geometry.nLine]
+        self.impactEles     = geometry.impactElements()
+
+        nStory              = geometry.nStory
+        self.nSteps         = 0
+        self.maxDisplacement = 0.0
+        self.driftMax       = np.zeros(nStory)
+        self.accMax         = np.zeros(nStory+1)
+        self.velMax         = np.zeros(nStory+1)
+        self.resDrift       = np.zeros(nStory)
+        self.firstExceed    = {limit: np.full(nStory, np.nan)
+                               for limit in exceedLimits}
+        self.impactMax      = {side: 0.0 for side in self.impactEles}
+        self.minAxial       = np.inf
+
+        # state where the worst drift is closest to okDrift; at rest until
+        # a step converges
+        self.okMiss         = np.inf
+        self.okState        = (np.zeros(nStory), np.zeros(nStory+1),
+                               np.zeros(nStory+1))
+
+    # call after each converged step
+    def record(self):
+        controlTime = ops.getTime()
+        ag          = np.interp(controlTime, self.gmTime, self.gmAccel,
+                                right=0.0)*self.gmFactor
+
+        disp        = np.array([[ops.nodeDisp(node, 1) for node in floor]
+                                for floor in self.storyNodes])
+        vel         = np.array([[ops.nodeVel(node, 1) for node in floor]
+                                for floor in self.storyNodes])
+        acc         = np.array([[ops.nodeAccel(node, 1) for node in floor]
+                                for floor in self.storyNodes])
+        acc         = (acc + ag)/self.g
+
+        drift       = np.abs(disp[1:] - disp[:-1]).max(axis=1)/self.storyHeight
+        accAbs      = np.abs(acc).max(axis=1)
+        velAbs      = np.abs(vel).max(axis=1)
+
+        self.nSteps += 1
+        self.maxDisplacement = max(self.maxDisplacement,
+            max(abs(ops.nodeDisp(node, 1)) for node in self.isolNodes))
+        np.maximum(self.driftMax, drift, out=self.driftMax)
+        np.maximum(self.accMax, accAbs, out=self.accMax)
+        np.maximum(self.velMax, velAbs, out=self.velMax)
+        self.resDrift = drift
+
+        for limit in self.exceedLimits:
+            first = self.firstExceed[limit]
+            first[np.isnan(first) & (drift > limit)] = controlTime
+
+        okMiss      = abs(drift.max() - self.okDrift)
+        if okMiss < self.okMiss:
+            self.okMiss     = okMiss
+            self.okState    = (drift, accAbs, velAbs)
+
+        for side, ele in self.impactEles.items():
+            self.impactMax[side] = max(self.impactMax[side],
+                abs(ops.eleResponse(ele, 'basicForce')[0]))
+        self.minAxial = min(self.minAxial,
+            min(abs(ops.eleResponse(ele, 'localForce')[0]) for ele in self.isolEles))
+
+    # plain dict kept on the run context
+    def summary(self):
+        return({
+            'nSteps'            : self.nSteps,
+            'maxDisplacement'   : self.maxDisplacement,
+            'driftMax'          : self.driftMax,
+            'accMax'            : self.accMax,
+            'velMax'            : self.velMax,
+            'okState'           : self.okState,
+            'resDrift'          : self.resDrift,
+            'firstExceed'       : self.firstExceed,
+            'impactMax'         : self.impactMax,
+            'minAxial'          : self.minAxial,
+        })
@@ -0,0 +1,114 @@
+############################################################################
+#               Elastic response spectrum
+
+# Created by:   Huy Pham
+#               University of California, Berkeley
+
+# Date created: October 2026
+
+# Description:  Pseudo-spectral acceleration of ground motion records,
+#               computed in-process from the cached AT2 arrays
+#               Linear SDOF solved with the piecewise-exact recursion for
+#               linearly varying excitation (Nigam & Jennings 1969,
+#               Chopra Table 5.2.1), vectorized over records and periods
+#               Units follow the records: accel in g, pSa in g
+
+# Open issues:  (1) max response is taken over the record duration only,
+#                   free vibration after the last sample is not included
+
+############################################################################
+
+import numpy as np
+
+from recordStore import getStore
+
+# recursion coefficients for unit mass, per (dt, period) lane
+# u[i+1] = A*u[i] + B*v[i] + C*p[i] + D*p[i+1]
+# v[i+1] = Ap*u[i] + Bp*v[i] + Cp*p[i] + Dp*p[i+1]
+def sdofCoefficients(dt, periods, damping=0.05):
+    dt          = np.asarray(dt, dtype=np.float64)
+    wn          = 2*np.pi/np.asarray(periods, dtype=np.float64)
+    z           = damping
+    k           = wn**2
+    sq          = np.sqrt(1 - z**2)
+    wd          = wn*sq
+
+    ex          = np.exp(-z*wn*dt)
+    s           = np.sin(wd*dt)
+    c           = np.cos(wd*dt)
+
+    A           = ex*(z/sq*s + c)
+    B           = ex*(s/wd)
+    C           = 1/k*(2*z/(wn*dt) + ex*(((1 - 2*z**2)/(wd*dt) - z/sq)*s -
+                                         (1 + 2*z/(wn*dt))*c))
+    D           = 1/k*(1 - 2*z/(wn*dt) + ex*((2*z**2 - 1)/(wd*dt)*s +
+                                             2*z/(wn*dt)*c))
+    Ap          = -ex*(wn/sq*s)
+    Bp          = ex*(c - z/sq*s)
+    Cp          = 1/k*(-1/dt + ex*((wn/sq + z/(dt*sq))*s + c/dt))
+    Dp          = 1/(k*dt)*(1 - ex*(z/sq*s + c))
+
+    return(A, B, C, D, Ap, Bp, Cp, Dp)
+
+# pSa of many records over a period grid
+# accels: list of 1-D arrays (g), dts: one time step per record
+# returns (nRec, nPeriod); periods <= 0 return the PGA
+def responseSpectra(accels, dts, periods, damping=0.05):
+    periods     = np.atleast_1d(np.asarray(periods, dtype=np.float64))
+    nRec        = len(accels)
+    nT          = len(periods)
+    npts        = np.array([len(accel) for accel in accels])
+
+    pSa         = np.zeros((nRec, nT))
+    pga         = np.array([np.max(np.abs(accel)) for accel in accels])
+    rigid       = periods <= 0.0
+    pSa[:,rigid] = pga[:,None]
+
+    dynamic     = np.flatnonzero(~rigid)
+    if len(dynamic) == 0:
+        return(pSa)
+
+    # one lane per (record, period), records zero-padded to a common length
+    laneT       = np.tile(periods[dynamic], nRec)
+    laneDt      = np.repeat(np.asarray(dts, dtype=np.float64), len(dynamic))
+    laneN       = np.repeat(npts, len(dynamic))
+    (A, B, C, D, Ap, Bp, Cp, Dp) = sdofCoefficients(laneDt, laneT, damping)
+
+    ground      = np.zeros((npts.max(), nRec))
+    for j, accel in enumerate(accels):
+        ground[:len(accel), j] = accel
+    recLane     = np.repeat(np.arange(nRec), len(dynamic))
+
+    u           = np.zeros(len(laneT))
+    v           = np.zeros(len(laneT))
+    uMax        = np.zeros(len(laneT))
+    pNow        = -ground[0, recLane]
+
+    for i in range(npts.max() - 1):
+        pNext   = -ground[i+1, recLane]
+        u, v    = (A*u + B*v + C*pNow + D*pNext,
+                   Ap*u + Bp*v + Cp*pNow + Dp*pNext)
+        # lanes past the end of their record stop tracking
+        np.maximum(uMax, np.abs(u), out=uMax, where=(i+1 < laneN))
+        pNow    = pNext
+
+    # pseudo-acceleration, wn^2*max|u|
+    wn          = 2*np.pi/laneT
+    pSa[:,dynamic] = (wn**2*uMax).reshape(nRec, len(dynamic))
+
+    return(pSa)
+
+# single record, returns (nPeriod,)
+def responseSpectrum(accel, dt, periods, damping=0.05):
+    return(responseSpectra([np.asarray(accel)], [dt], periods, damping)[0])
+
+# records by name (without .AT2) from a PEER folder, via the npy cache
+def recordSpectra(gmDir, gmFiles, periods, damping=0.05):
+    store       = getStore(gmDir)
+    accels      = []
+    dts         = []
+    for gmFile in gmFiles:
+        dt, npts, accel = store.getRecord(gmFile)
+        accels.append(np.asarray(accel))
+        dts.append(dt)
+    return(responseSpectra(accels, dts, periods, damping))
@@ -0,0 +1,203 @@
+############################################################################
+#               Results store
+
+# Created by:   Huy Pham
+#               University of California, Berkeley
+
+# Date created: October 2026
+
+# Description:  Append-only SQLite table of run results
+#               Each run's record (one row from failurePostprocess) is
+#               inserted and committed on its own, so the cost of saving
+#               does not grow with the database and a crash loses at most
+#               the run in progress
+#               Column types follow the values: INTEGER, REAL or TEXT;
+#               columns first seen in a later run are added on the fly
+#               read() returns the DataFrame runControl used to build
+#               Checkpoint: every LHS index gets a status (finished, failed,
+#               skipped) committed with its result, and the session inputs
+#               (LHS samples, GM assignment, GM random state) are kept in
+#               the same file, so an interrupted database can be resumed
+
+# Open issues:  (1) a column's type is fixed by the first value stored
+
+############################################################################
+
+import os, os.path
+import json
+import numbers
+import sqlite3
+import numpy as np
+import pandas as pd
+
+def sqlType(value):
+    if isinstance(value, (bool, np.bool_, numbers.Integral)):
+        return('INTEGER')
+    if isinstance(value, numbers.Real):
+        return('REAL')
+    return('TEXT')
+
+def sqlValue(value):
+    if isinstance(value, (bool, np.bool_, numbers.Integral)):
+        return(int(value))
+    if isinstance(value, numbers.Real):
+        return(float(value))
+    if value is None:
+        return(None)
+    return(str(value))
+
+def quoted(name):
+    return('"' + str(name).replace('"', '""') + '"')
+
+class ResultsStore:
+
+    # runId is stored with every row (LHS index), in its own column
+    def __init__(self, dbFile='./sessionOut/sessionSummary.db', table='runs'):
+        self.dbFile         = dbFile
+        self.table          = table
+        self.statusTable    = table + 'Status'
+        self.sessionTable   = table + 'Session'
+        if os.path.dirname(dbFile):
+            os.makedirs(os.path.dirname(dbFile), exist_ok=True)
+        self.connection = sqlite3.connect(dbFile)
+        self.columns    = self.tableColumns()
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS ' +
+                                    quoted(self.statusTable) +
+                                    ' (runId INTEGER PRIMARY KEY, status TEXT,' +
+                                    ' runStatus INTEGER)')
+
+    def tableColumns(self):
+        info = self.connection.execute('PRAGMA table_info(' +
+                                       quoted(self.table) + ')').fetchall()
+        return([row[1] for row in info])
+
+    # drop every result and run status stored so far (new database)
+    # the session inputs are kept; saveSession replaces them
+    def clear(self):
+        with self.connection:
+            self.connection.execute('DROP TABLE IF EXISTS ' + quoted(self.table))
+            self.connection.execute('DELETE FROM ' + quoted(self.statusTable))
+        self.columns = []
+
+    # drop the results and status of some runs, so they can be rerun
+    def dropRuns(self, runIds):
+        runIds = [(int(runId),) for runId in runIds]
+        with self.connection:
+            if self.columns:
+                self.connection.executemany('DELETE FROM ' + quoted(self.table) +
+                                            ' WHERE runId = ?', runIds)
+            self.connection.executemany('DELETE FROM ' + quoted(self.statusTable) +
+                                        ' WHERE runId = ?', runIds)
+
+    # record: one-row DataFrame, or a dict of column -> value
+    # with a runId, the run is marked finished in the same transaction
+    def append(self, record, runId=None, runStatus=None):
+        if isinstance(record, pd.DataFrame):
+            record = record.iloc[0].to_dict()
+        values = {'runId': runId}
+        values.update(record)
+
+        with self.connection:
+            if not self.columns:
+                columnDefs = [quoted(name) + ' ' + sqlType(value)
+                              for name, value in values.items()]
+                columnDefs[0] = quoted('runId') + ' INTEGER'
+                self.connection.execute('CREATE TABLE ' + quoted(self.table) +
+                                        ' (' + ', '.join(columnDefs) + ')')
+                self.columns = list(values)
+            for name, value in values.items():
+                if name not in self.columns:
+                    self.connection.execute('ALTER TABLE ' + quoted(self.table) +
+                                            ' ADD COLUMN ' + quoted(name) + ' ' +
+                                            sqlType(value))
+                    self.columns.append(name)
+
+            names = list(values)
+            self.connection.execute(
+                'INSERT INTO ' + quoted(self.table) + ' (' +
+                ', '.join(quoted(name) for name in names) + ') VALUES (' +
+                ', '.join('?'*len(names)) + ')',
+                [sqlValue(values[name]) for name in names])
+            if runId is not None:
+                self.setStatus([runId], 'finished', runStatus)
+
+    # status of runs without results: 'failed' or 'skipped'
+    def markRuns(self, runIds, status, runStatus=None):
+        with self.connection:
+            self.setStatus(runIds, status, runStatus)
+
+    def setStatus(self, runIds, status, runStatus=None):
+        self.connection.executemany('INSERT OR REPLACE INTO ' +
+                                    quoted(self.statusTable) +
+                                    ' (runId, status, runStatus) VALUES (?, ?, ?)',
+                                    [(int(runId), status, sqlValue(runStatus))
+                                     for runId in runIds])
+
+    # runId, status and runStatus of every LHS index handled so far
+    def runStatuses(self):
+        return(pd.read_sql_query('SELECT * FROM ' + quoted(self.statusTable) +
+                                 ' ORDER BY runId', self.connection))
+
+    # session inputs, needed to resume
+    # frames: name -> DataFrame (stored as tables, floats exactly)
+    # values: name -> anything json can hold
+    def saveSession(self, frames, values):
+        for name, frame in frames.items():
+            frame.to_sql(self.sessionTable + '_' + name, self.connection,
+                         if_exists='replace', index=False)
+        with self.connection:
+            self.connection.execute('DROP TABLE IF EXISTS ' +
+                                    quoted(self.sessionTable))
+            self.connection.execute('CREATE TABLE ' + quoted(self.sessionTable) +
+                                    ' (name TEXT PRIMARY KEY, value TEXT)')
+            self.connection.executemany('INSERT INTO ' + quoted(self.sessionTable) +
+                                        ' (name, value) VALUES (?, ?)',
+                                        [(name, json.dumps(value))
+                                         for name, value in values.items()] +
+                                        [('frames', json.dumps(list(frames)))])
+
+    # (frames, values) as saved, or None if no session is stored
+    def loadSession(self):
+        exists = self.connection.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name=?",
+            (self.sessionTable,)).fetchone()
+        if exists is None:
+            return(None)
+        values  = {name: json.loads(value) for name, value in
+                   self.connection.execute('SELECT name, value FROM ' +
+                                           quoted(self.sessionTable))}
+        frames  = {name: pd.read_sql_query('SELECT * FROM ' +
+                                           quoted(self.sessionTable+'_'+name),
+                                           self.connection)
+                   for name in values.pop('frames')}
+        return(frames, values)
+
+    def count(self):
+        if not self.columns:
+            return(0)
+        return(self.connection.execute('SELECT COUNT(*) FROM ' +
+                                       quoted(self.table)).fetchone()[0])
+
+    # results as a DataFrame
+    # newestFirst matches the old pd.concat([thisRun, resultsDf]) order
+    def read(self, newestFirst=True, withRunId=False):
+        if not self.columns:
+            return(pd.DataFrame())
+        order   = ' ORDER BY rowid DESC' if newestFirst else ' ORDER BY rowid'
+        results = pd.read_sql_query('SELECT * FROM ' + quoted(self.table) +
+                                    order, self.connection)
+        if not withRunId:
+            results = results.drop(columns=['runId'])
+        return(results)
+
+    def close(self):
+        self.connection.close()
+
+# read a stored database without keeping it open
+def readResults(dbFile='./sessionOut/sessionSummary.db', table='runs',
+                newestFirst=True):
+    store   = ResultsStore(dbFile, table)
+    results = store.read(newestFirst=newestFirst)
+    store.close()
+    return(results)
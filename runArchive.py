@@ -0,0 +1,82 @@
+############################################################################
+#               Run archive
+
+# Created by:   Huy Pham
+#               University of California, Berkeley
+
+# Date created: October 2026
+
+# Description:  Keeps each run's recorder histories as one compressed .npz
+#               (float32, one array per recorder file) keyed by run id,
+#               outside ./outputs/ so they survive the next run
+#               Readers return the same DataFrames as reading the csv
+#               recorders, for postprocessing.py and plotter.py
+
+# Open issues:  (1) float32 keeps ~7 significant digits, the recorders
+#                   write 6
+
+############################################################################
+
+import os, os.path
+import glob
+import tempfile
+import numpy as np
+import pandas as pd
+
+# reader over the csv recorder files of an output folder
+# reader(channel, names) -> DataFrame, channel is the file name without .csv
+def csvReader(dataDir):
+    def readChannel(channel, names):
+        return(pd.read_csv(os.path.join(dataDir, channel+'.csv'), sep=' ',
+                           header=None, names=names))
+    return(readChannel)
+
+class RunArchive:
+
+    def __init__(self, archiveDir='./sessionOut/archive/'):
+        self.archiveDir = archiveDir
+
+    def runFile(self, runId):
+        return(os.path.join(self.archiveDir, 'run_'+str(runId)+'.npz'))
+
+    def runIds(self):
+        files = glob.glob(os.path.join(self.archiveDir, 'run_*.npz'))
+        return(sorted(int(os.path.basename(f)[4:-4]) for f in files))
+
+    # pack every recorder csv of dataDir into run_<runId>.npz
+    def save(self, runId, dataDir):
+        channels = dict()
+        for csvFile in sorted(glob.glob(os.path.join(dataDir, '*.csv'))):
+            channel = os.path.splitext(os.path.basename(csvFile))[0]
+            history = pd.read_csv(csvFile, sep=' ', header=None)
+            history = history.dropna(axis=1, how='all')    # trailing separators
+            channels[channel] = history.to_numpy(dtype=np.float32)
+
+        # written to a temp file then renamed, so readers never see a
+        # partial archive
+        os.makedirs(self.archiveDir, exist_ok=True)
+        fd, tmpName = tempfile.mkstemp(suffix='.npz', dir=self.archiveDir)
+        with os.fdopen(fd, 'wb') as tmpFile:
+            np.savez_compressed(tmpFile, **channels)
+        os.replace(tmpName, self.runFile(runId))
+        return(self.runFile(runId))
+
+    # all channels of a run, as {channel: (nSteps, nColumns) float32}
+    def load(self, runId):
+        with np.load(self.runFile(runId)) as runData:
+            return({channel: runData[channel] for channel in runData.files})
+
+    def loadFrame(self, runId, channel, names):
+        with np.load(self.runFile(runId)) as runData:
+            history = runData[channel]
+        return(pd.DataFrame(history[:, :len(names)].astype(np.float64),
+                            columns=names))
+
+    # same interface as csvReader
+    def reader(self, runId):
+        runData = self.load(runId)
+        def readChannel(channel, names):
+            return(pd.DataFrame(
+                runData[channel][:, :len(names)].astype(np.float64),
+                columns=names))
+        return(readChannel)
@@ -0,0 +1,58 @@
+############################################################################
+#               Run context
+
+# Created by:   Huy Pham
+#               University of California, Berkeley
+
+# Date created: October 2026
+
+# Description:  In-memory state for a single run
+#               Carries the parameter dict, design result, gravity loads and
+#               output location through design -> build -> runGM -> postprocess
+#               Replaces the ./inputs/bearingInput.csv handshake and the
+#               buildModel load globals
+
+# Open issues:  (1)
+
+############################################################################
+
+import os, os.path
+import pandas as pd
+from demandExtraction import FrameGeometry
+
+class RunContext:
+
+    # param is dictionary of all inputs. call with param['whatYouWant']
+    # geometry: story and bay count the recorders and monitors follow
+    def __init__(self, param, outputDir='./outputs/',
+                 gmDir='./groundMotions/PEERNGARecords_Unscaled/',
+                 geometry=None):
+        self.param = dict(param)
+        self.outputDir = os.path.join(outputDir, '')
+        self.gmDir = gmDir
+        self.design = None
+        self.loads = None
+        self.Tfb = None
+        self.stopReason = None
+        self.envelope = None
+        self.archive = None         # runArchive.RunArchive, to keep histories
+        self.runId = None
+        self.geometry = geometry if geometry is not None else FrameGeometry()
+
+    # legacy entry point: read parameters from the input csv
+    @classmethod
+    def fromCsv(cls, inputFile='./inputs/bearingInput.csv', **kwargs):
+        bearingParams = pd.read_csv(inputFile, index_col=None, header=0)
+        param = dict(zip(bearingParams.variable, bearingParams.value))
+        return cls(param, **kwargs)
+
+    # design once per run, reused by build and postprocessing
+    def getDesign(self):
+        if self.design is None:
+            import superStructDesign as sd
+            self.design = sd.design(self.param)
+        return(self.design)
+
+    def makeOutputDir(self):
+        os.makedirs(self.outputDir, exist_ok=True)
+        return(self.outputDir)
@@ -8,7 +8,7 @@
 
 # Description:  Script designs TFP bearing given site parameters and desired stiffness and damping.
 #               Script also designs superstructure following ASCE 7-16 Ch.12 & 17 provisions
-#               Inputs rely on dictionary calling
+#               Inputs rely on dictionary calling, passed in from the run context
 
 # Open issues:  (1) Rework beam and column selection using repeatable functions
 
@@ -44,7 +44,73 @@ def calcStrength(shape, VGrav):
 
     return(Mn, Mpr, Vpr, beamVGrav)
 
-def design():
+############################################################################
+#              Design cache
+############################################################################
+
+# designs (and failed designs) keyed on the input parameters
+designCache     = dict()
+cacheStats      = {'hits': 0, 'misses': 0}
+
+# shape tables only need reading once per process
+shapeTables     = dict()
+
+def loadShapes(shapeFile):
+    if shapeFile not in shapeTables:
+        shapes  = pd.read_csv(shapeFile, index_col=None, header=0)
+        shapeTables[shapeFile] = shapes.sort_values(by=['Ix'])
+    return(shapeTables[shapeFile])
+
+def getCacheStats():
+    nCalls  = cacheStats['hits'] + cacheStats['misses']
+    hitRate = cacheStats['hits']/nCalls if nCalls > 0 else 0.0
+    return({**cacheStats, 'calls': nCalls, 'hitRate': hitRate})
+
+def clearDesignCache():
+    designCache.clear()
+    cacheStats['hits']      = 0
+    cacheStats['misses']    = 0
+
+# hashable key of a parameter dict
+def getDesignKey(param):
+    return(tuple(sorted((name, float(value)) for name, value in param.items())))
+
+# callers get their own copy of the shape rows, so a change made by one run
+# does not reach the cached design
+def copyDesign(result):
+    return(tuple(item.copy() if isinstance(item, pd.DataFrame) else item
+                 for item in result))
+
+def design(param=None):
+
+    # param is dictionary of all inputs. call with param['whatYouWant']
+    # if not passed in (standalone use), read from the input file
+    if param is None:
+        bearingParams = pd.read_csv('./inputs/bearingInput.csv', 
+            index_col=None, header=0)
+        param   = dict(zip(bearingParams.variable, bearingParams.value))
+
+    designKey   = getDesignKey(param)
+
+    # failures are cached too, and raised again on a hit
+    if designKey in designCache:
+        cacheStats['hits'] += 1
+        result  = designCache[designKey]
+        if isinstance(result, Exception):
+            raise result
+        return(copyDesign(result))
+
+    cacheStats['misses'] += 1
+    try:
+        result  = solveDesign(param)
+    except (ValueError, IndexError) as err:
+        designCache[designKey] = err
+        raise
+
+    designCache[designKey] = result
+    return(copyDesign(result))
+
+def solveDesign(param):
 
     ############################################################################
     #              Bearing Design
@@ -66,12 +132,6 @@ def design():
     ksi     = kip/(inch**2)
 
     # TFP Algorithm: Becker & Mahin
-    bearingParams = pd.read_csv('./inputs/bearingInput.csv', 
-        index_col=None, header=0)
-
-    # param is dictionary of all inputs. call with param['whatYouWant']
-    param   = dict(zip(bearingParams.variable, bearingParams.value))
-
     # Building params, hardcoded
     # Mostly constant, so not varying
     Ws      = 2227.5*kip
@@ -233,13 +293,8 @@ def design():
     IBeamRoofReq    = Ib[-1]
     ZBeamRoofReq    = Zb[-1]
 
-    beamShapes      = pd.read_csv('./inputs/beamShapes.csv',
-        index_col=None, header=0)
-    sortedBeams     = beamShapes.sort_values(by=['Ix'])
-
-    colShapes       = pd.read_csv('./inputs/colShapes.csv',
-        index_col=None, header=0)
-    sortedCols      = colShapes.sort_values(by=['Ix'])
+    sortedBeams     = loadShapes('./inputs/beamShapes.csv')
+    sortedCols      = loadShapes('./inputs/colShapes.csv')
 
     ############################################################################
     #              ASCE 7-16: Capacity design
@@ -450,6 +505,135 @@ def design():
 
     return(mu1, mu2, mu3, param['R1'], R2, R3, moatGap, selectedBeam, selectedRoofBeam, selectedCol)
 
+############################################################################
+#              Batch bearing design
+############################################################################
+
+def scalarPow(base, exponent):
+    return(np.array([value**exponent for value in base], dtype=np.float64))
+
+def design_batch(params_array, paramNames=None):
+
+    # vectorized Becker & Mahin bearing solver over many LHS rows at once
+    # mirrors the scalar loop in solveDesign step for step (including the
+    # complex arithmetic, carried here as real and imaginary parts) so the
+    # results are identical to the scalar path run on numpy float64 params
+    # feasible is False where solveDesign would raise ValueError
+    # superstructure (shape selection) is not checked here
+
+    # accept LHS arrays (ordered as LHS.py), DataFrames or dicts of arrays
+    if isinstance(params_array, np.ndarray):
+        if paramNames is None:
+            paramNames = ['S1', 'Tm', 'zetaM', 'mu1', 'R1', 'moatAmpli', 'RI']
+        params_array = np.atleast_2d(params_array)
+        param = {name: params_array[:,i].astype(np.float64)
+                 for i, name in enumerate(paramNames)}
+    else:
+        param = {name: np.asarray(params_array[name], dtype=np.float64)
+                 for name in ['S1', 'Tm', 'zetaM', 'mu1', 'R1', 'moatAmpli']}
+
+    # units: in, kip, s
+    inch    = 1.0
+    sec     = 1
+    g       = 386.4*inch/(sec**2)
+    pi      = math.pi
+
+    # from ASCE Ch. 17, get damping multiplier
+    zetaRef = [0.02, 0.05, 0.10, 0.20, 0.30, 0.40, 0.50]
+    BmRef   = [0.8, 1.0, 1.2, 1.5, 1.7, 1.9, 2.0]
+
+    Bm      = np.interp(param['zetaM'], zetaRef, BmRef)
+
+    # ASCE expected maximum displacement, from spectrum (also Ch. 17)
+    Dm      = g*param['S1']*param['Tm']/(4*pi**2*Bm)
+    x       = Dm
+
+    # yielding displacement
+    xy      = 0.01*inch
+
+    nRows   = len(x)
+    R1      = param['R1']
+    mu1Real = np.full(nRows, np.nan)
+    mu1Imag = np.full(nRows, np.nan)
+    mu2Real = np.full(nRows, np.nan)
+    mu2Imag = np.full(nRows, np.nan)
+    R2      = np.full(nRows, np.nan)
+
+    # rows still increasing radius of curvature
+    muBad   = np.ones(nRows, dtype=bool)
+
+    # same RMult sequence (and float accumulation) as the scalar loop
+    RMult   = 1.1
+
+    while muBad.any():
+        if RMult > 10.0:
+            break
+
+        i       = muBad
+        R2i     = RMult*R1[i]
+        R3i     = RMult*R1[i]
+
+        k0      = param['mu1'][i]/xy
+        a       = 1/(2*R1[i])
+        b       = 1/(R2i + R3i)
+
+        # powers taken elementwise on numpy scalars, as the array power
+        # (and square) may differ from the scalar solver in the last bit
+        kM      = scalarPow(2*pi/param['Tm'][i], 2) * (1/g)
+        x2      = scalarPow(x[i], 2)
+        Wm      = param['zetaM'][i]*(2*pi*kM*x2)
+
+        # x1 is real if the radicand is non-negative, purely imaginary if not
+        radicand    = -Wm/4 + (kM - b)*x2 - (k0 - a)*xy**2
+        root        = np.sqrt(np.abs(radicand))
+        coef        = scalarPow(a-b, -1/2)
+        x1Real      = np.where(radicand >= 0, coef*root, 0.0)
+        x1Imag      = np.where(radicand >= 0, 0.0, coef*root)
+
+        mu2r    = kM*x[i] - b*(x[i] - x1Real)
+        mu2i    = b*x1Imag
+
+        # complex/real division in numpy scales by the reciprocal
+        scl     = 1.0/(2*R1[i])
+        mu1r    = -x1Real*scl + mu2r
+        mu1i    = -x1Imag*scl + mu2i
+
+        mu1Real[i]  = mu1r
+        mu1Imag[i]  = mu1i
+        mu2Real[i]  = mu2r
+        mu2Imag[i]  = mu2i
+        R2[i]       = R2i
+
+        stillBad    = ((mu1r < 0.01) | (mu2r < 0.01) |
+                       (mu1i != 0) | (mu2i != 0))
+        muBad[i]    = stillBad
+
+        RMult   += 0.1
+
+    # abort criteria of the scalar solver
+    feasible    = ~((mu1Real < 0) | (mu2Real < 0) |
+                    (mu1Imag != 0) | (mu2Imag != 0))
+
+    mu1     = np.where(feasible, mu1Real, np.nan)
+    mu2     = np.where(feasible, mu2Real, np.nan)
+    R2      = np.where(feasible, R2, np.nan)
+
+    # Since we are doing 2D analysis, we don't want to overdesign for torsion
+    Dtm         = 1.0*Dm
+    moatGap     = param['moatAmpli']*Dtm
+
+    return(pd.DataFrame({
+        'mu1'       : mu1,
+        'mu2'       : mu2,
+        'mu3'       : mu2,
+        'R1'        : R1,
+        'R2'        : R2,
+        'R3'        : R2,
+        'moatGap'   : moatGap,
+        'Dm'        : Dm,
+        'feasible'  : feasible,
+    }))
+
 # if ran as standalone, display designs
 if __name__ == '__main__':
     (mu1, mu2, mu3, R1, R2, R3, moatGap, selectedBeam, selectedRoofBeam, selectedCol) = design()
@@ -462,4 +646,5 @@ if __name__ == '__main__':
     print('Selected roof beam:')
     print(selectedRoofBeam)
     print('Selected column:')
-    print(selectedCol)
\ No newline at end of file
+    print(selectedCol)
+    print('Design cache: ', getCacheStats())
\ No newline at end of file
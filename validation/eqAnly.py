@@ -7,6 +7,9 @@
 # Date created: May 2020
 
 # Description:  Script performs dynamic analysis on OpenSeesPy model
+#               Eigenvalues are kept per design (modalCache): later GMs of
+#               the IDA and the time step retries rebuild the model and rerun
+#               gravity, but skip refix and eigen
 
 # Open issues:  (1) 
 
@@ -15,6 +18,7 @@
 
 # import OpenSees and libraries
 from math import floor
+import pandas as pd
 import openseespy.opensees as ops
 
 ############################################################################
@@ -23,7 +27,19 @@ import openseespy.opensees as ops
 
 import buildModel as bm
 
-def runGM(gmFilename, gmDefScale, dtTransient):
+# eigenvalues of each design, from its first eigen analysis in this process
+# ARPACK's start vector carries over between eigen calls, so a later call
+# on the same model differs in the last digits; reusing the first call's
+# values gives every GM on a design the result of a fresh process
+modalCache      = dict()
+
+# the design is read from the input file (superStructDesign.design)
+def getDesignKey(inputFile='./inputs/bearingInputVal.csv'):
+    bearingParams   = pd.read_csv(inputFile, index_col=None, header=0)
+    return(tuple(sorted(zip(bearingParams.variable,
+                            bearingParams.value.astype(float)))))
+
+def runGM(gmFilename, gmDefScale, dtTransient, reuseModal=True):
 
     # build model
     bm.build()
@@ -95,27 +111,35 @@ def runGM(gmFilename, gmDefScale, dtTransient):
     #                       Eigenvalue Analysis
     ############################################################################
 
-    # fix base for Tfb
-    bm.refix(11, "fix")
-    bm.refix(12, "fix")
-    bm.refix(13, "fix")
-    bm.refix(14, "fix")
-    # bm.refix(15, "fix")
+    designKey   = getDesignKey()
+
+    if reuseModal and (designKey in modalCache):
+        lambdaN     = modalCache[designKey]
+    else:
+        # fix base for Tfb
+        bm.refix(11, "fix")
+        bm.refix(12, "fix")
+        bm.refix(13, "fix")
+        bm.refix(14, "fix")
+        # bm.refix(15, "fix")
+
+        nEigenJ     = 3;                    # mode j = 3
+        lambdaN     = ops.eigen(nEigenJ);       # eigenvalue analysis for nEigenJ modes
+
+        # unfix base
+        bm.refix(11, "unfix")
+        bm.refix(12, "unfix")
+        bm.refix(13, "unfix")
+        bm.refix(14, "unfix")
+        # bm.refix(15, "unfix")
+
+        modalCache.setdefault(designKey, lambdaN)
 
-    nEigenJ     = 3;                    # mode j = 3
-    lambdaN     = ops.eigen(nEigenJ);       # eigenvalue analysis for nEigenJ modes
     lambda1     = lambdaN[0];           # eigenvalue mode i = 1
     omega1      = lambda1**(0.5)    # w1 (1st mode circular frequency)
     Tfb         = 2*3.1415/omega1      # 1st mode period of the structure
     print("Tfb = ", Tfb, " s")          # display the first mode period in the command window
 
-    # unfix base
-    bm.refix(11, "unfix")
-    bm.refix(12, "unfix")
-    bm.refix(13, "unfix")
-    bm.refix(14, "unfix")
-    # bm.refix(15, "unfix")
-
     # Rayleigh damping to the superstructure only
     regTag      = 80
     # zetaTarget  = 0.05
@@ -51,8 +51,15 @@ import postprocessing
 import eqAnly as eq
 import gmSelector
 
-# initialize dataframe as an empty object
-resultsDf = None
+# results store shared with the main database (../resultsStore.py); local
+# modules stay first on the path
+import sys
+sys.path.append('..')
+from resultsStore import ResultsStore
+
+# results appended run by run (resultsStore.py)
+store = ResultsStore('./sessionOut/sessionSummary.db')
+store.clear()
 
 # filter GMs, then get ground motion database list
 gmPath 	= '../groundMotions/PEERNGARecords_Unscaled/'
@@ -112,12 +119,12 @@ for lvl in IDALevel:
         resultsHeader, thisRun  = postprocessing.failurePostprocess(filename, 
             scaleFactor, specAvg, runStatus, Tfb, lvl)
 
-        # if initial run, start the dataframe with headers from postprocessing
-        if resultsDf is None:
-            resultsDf           = pd.DataFrame(columns=resultsHeader)
-        
-        # add results onto the dataframe
-        resultsDf               = pd.concat([thisRun,resultsDf], sort=False)
+        # add results onto the store, saved as they come
+        store.append(thisRun)
+
+# newest run first, as the old accumulated dataframe
+resultsDf = store.read()
+store.close()
 
 gmDatabase.to_csv(gmPath+databaseFile, index=False)
 resultsDf.to_csv('./sessionOut/sessionSummary.csv', index=False)